@@ -0,0 +1,24 @@
+import hashlib
+import os
+from pathlib import Path
+
+
+CACHE_DIR = Path(os.getenv("DOCUWIZARD_CACHE_DIR", Path.home() / ".cache" / "docuwizard"))
+
+
+def cache_dir(namespace: str) -> Path:
+    path = CACHE_DIR / namespace
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def hash_parts(*parts) -> str:
+    digest = hashlib.sha1()
+
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(part)
+        digest.update(b"\0")
+
+    return digest.hexdigest()
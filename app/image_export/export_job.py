@@ -0,0 +1,72 @@
+import time
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from .exporter import ExportCancelled
+
+
+class ExportSignals(QObject):
+    progress = Signal(object)
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+
+class ExportJob(QRunnable):
+    def __init__(self, exporter, ordered_paths, save_path, report_interval: float = 0.1):
+        super().__init__()
+        self.exporter = exporter
+        self.ordered_paths = list(ordered_paths)
+        self.save_path = save_path
+        self.report_interval = report_interval
+        self.last_report = 0.0
+        self.signals = ExportSignals()
+
+        self.exporter.progress = self.report_progress
+
+    def report_progress(self, progress):
+        # Passthrough pages can finish thousands per second, so progress is throttled
+        # before it crosses into the UI thread
+        now = time.perf_counter()
+        if now - self.last_report >= self.report_interval or progress.pages_done == progress.total_pages:
+            self.last_report = now
+            self.signals.progress.emit(progress)
+
+    def cancel(self):
+        self.exporter.cancel()
+
+    def run(self):
+        try:
+            progress = self.exporter.export(self.ordered_paths, self.save_path)
+        except ExportCancelled:
+            print(f"[EXPORT] Cancelled export to {self.save_path}")
+            self.signals.cancelled.emit()
+            return
+        except Exception as e:
+            print(f"[ERROR] Failed to export {self.save_path}: {e}")
+            self.signals.failed.emit(str(e))
+            return
+
+        self.signals.finished.emit(progress)
+
+
+class EstimateSignals(QObject):
+    finished = Signal(int, object)
+
+
+class EstimateTask(QRunnable):
+    def __init__(self, generation, estimate, profile):
+        super().__init__()
+        self.generation = generation
+        self.estimate = estimate
+        self.profile = profile
+        self.signals = EstimateSignals()
+
+    def run(self):
+        try:
+            result = self.estimate(self.profile)
+        except Exception as e:
+            print(f"[ERROR] Failed to estimate export size: {e}")
+            result = None
+
+        self.signals.finished.emit(self.generation, result)
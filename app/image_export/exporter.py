@@ -0,0 +1,405 @@
+import io
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops
+
+from app.rag.ocr import TEXT_LAYER_ATTACHMENT, create_ocr_pool, image_digest, recognise_lines, text_layer_payload
+from .pdf_writer import StreamingPdfWriter
+from .processed_cache import ocr_cache, page_cache, result_key
+from .processing import adjust_image, has_colour_edits
+from .profiles import DEFAULT_PROFILE, encoding_profile, page_layout
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+@dataclass
+class ExportProgress:
+    pages_done: int
+    total_pages: int
+    input_bytes: int
+    output_bytes: int
+    elapsed: float
+
+    @property
+    def pages_per_second(self):
+        return self.pages_done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mb_per_second(self):
+        return self.input_bytes / (1024 * 1024) / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def seconds_remaining(self):
+        rate = self.pages_per_second
+        return (self.total_pages - self.pages_done) / rate if rate > 0 else 0.0
+
+
+@dataclass
+class EncodedPage:
+    data: bytes
+    width: int
+    height: int
+    colorspace: str
+    input_bytes: int
+    filter: str = "DCTDecode"
+    decode_parms: str = ""
+    rotate: int = 0
+    page_size: tuple[float, float] | None = None
+    image_rect: tuple[float, float, float, float] | None = None
+    passthrough: bool = False
+
+
+JPEG_COLORSPACES = {"RGB": "DeviceRGB", "L": "DeviceGray"}
+MEMORY_BUDGET = 1024 * 1024 * 1024
+OCR_MAX_SIDE = 2000
+
+# mkstemp creates files readable by the owner only; exports get the permissions a
+# plain open() would give them. Read once at import, as changing it isn't thread safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class MemoryBudget:
+    def __init__(self, limit: int = MEMORY_BUDGET):
+        self.limit = limit
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def reserve(self, size):
+        size = min(size, self.limit)
+        with self.condition:
+            self.condition.wait_for(lambda: self.used + size <= self.limit)
+            self.used += size
+        return size
+
+    def release(self, size):
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+
+def page_memory(path):
+    with Image.open(path) as image:
+        width, height = image.size
+
+    # Pillow keeps RGB pixels in 4 bytes, and a page holds its decoded source and
+    # one processed copy at most
+    return width * height * 4 * 2
+
+
+def is_grayscale(image, tolerance: int = 6):
+    sample = image.copy()
+    sample.thumbnail((256, 256))
+    r, g, b = sample.split()
+
+    return all(
+        ImageChops.difference(first, second).getextrema()[1] <= tolerance
+        for first, second in ((r, g), (g, b))
+    )
+
+
+def png_idat(image):
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=6)
+    png = buffer.getvalue()
+
+    idat = []
+    position = 8
+    while position < len(png):
+        length, chunk_type = struct.unpack(">I4s", png[position: position + 8])
+        if chunk_type == b"IDAT":
+            idat.append(png[position + 8: position + 8 + length])
+        position += 12 + length
+
+    return b"".join(idat)
+
+
+def encode_image(image, profile):
+    colorspace = JPEG_COLORSPACES[image.mode]
+    buffer = io.BytesIO()
+
+    if profile.compression == "jpx":
+        image.save(buffer, "JPEG2000", quality_mode="dB", quality_layers=[profile.jpx_quality_db])
+        return buffer.getvalue(), colorspace, "JPXDecode", ""
+
+    if profile.compression == "flate":
+        decode_parms = (
+            f"/DecodeParms << /Predictor 15 /Colors {len(image.getbands())} "
+            f"/BitsPerComponent 8 /Columns {image.width} >> "
+        )
+        return png_idat(image), colorspace, "FlateDecode", decode_parms
+
+    image.save(buffer, "JPEG", quality=profile.jpeg_quality)
+    return buffer.getvalue(), colorspace, "DCTDecode", ""
+
+
+def encode_page(path, settings, profile=DEFAULT_PROFILE):
+    rotation = settings['rotation']['angle'] if settings else 0
+    colour_edits = bool(settings) and has_colour_edits(settings)
+    page_rotation = rotation if rotation % 90 == 0 else 0
+    input_bytes = os.path.getsize(path)
+
+    image = Image.open(path)
+    try:
+        page_size, image_rect, target = page_layout(image.width, image.height, profile)
+
+        if (
+            page_rotation == rotation
+            and not colour_edits
+            and profile.compression == "jpeg"
+            and image.format == "JPEG"
+            and image.mode in JPEG_COLORSPACES
+            and target == image.size
+        ):
+            image.close()
+            with open(path, "rb") as f:
+                data = f.read()
+
+            return EncodedPage(
+                data, image.width, image.height, JPEG_COLORSPACES[image.mode], input_bytes,
+                rotate=rotation, page_size=page_size, image_rect=image_rect, passthrough=True
+            )
+
+        if page_rotation == rotation:
+            image.draft("RGB", target)
+
+        # load() releases the file itself, and skipping the `with` block keeps an RGB
+        # source from being copied just to survive close()
+        image.load()
+    except Exception:
+        image.close()
+        raise
+
+    if image.mode != "RGB":
+        converted = image.convert("RGB")
+        image.close()
+        image = converted
+
+    if page_rotation == rotation:
+        image = image.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0) if image.size != target else image
+        if settings:
+            image = adjust_image(image, {**settings, 'rotation': {'angle': 0}}, in_place=True)
+    else:
+        image = adjust_image(image, settings, in_place=True)
+        page_size, image_rect, target = page_layout(image.width, image.height, profile)
+        if image.size != target:
+            image = image.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    if profile.detect_grayscale and is_grayscale(image):
+        image = image.convert("L")
+
+    data, colorspace, filter, decode_parms = encode_image(image, profile)
+
+    return EncodedPage(
+        data, image.width, image.height, colorspace, input_bytes, filter, decode_parms,
+        page_rotation, page_size, image_rect
+    )
+
+
+def recognise_page(path, settings, max_side=OCR_MAX_SIDE):
+    # Runs in an OCR worker process on a reduced copy of the page, rotated the way the
+    # reader will see it, so the boxes line up with the page after /Rotate
+    with Image.open(path) as image:
+        image.draft("RGB", (max_side, max_side))
+        image = image.convert("RGB")
+
+    image.thumbnail((max_side, max_side), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    if settings:
+        image = adjust_image(image, settings, in_place=True)
+
+    return recognise_lines(image.tobytes(), image.width, image.height, 3)
+
+
+class PdfExporter:
+    def __init__(self, images_settings, profile=DEFAULT_PROFILE, workers: int | None = None,
+                 window: int | None = None, progress=None, memory_budget: int = MEMORY_BUDGET):
+        self.images_settings = images_settings
+        self.profile = profile
+        self.workers = workers or min(8, os.cpu_count() or 2)
+        self.window = window or self.workers * 2
+        self.progress = progress
+        self.memory = MemoryBudget(memory_budget)
+        self.cancel_event = threading.Event()
+        self.cached_pages = 0
+        self.cached_pages_lock = threading.Lock()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def ocr_workers(self):
+        return max(1, min(self.workers, (os.cpu_count() or 2) - 1))
+
+    def encode(self, path):
+        settings = self.images_settings.get(path)
+        key = result_key(path, settings, encoding_profile(self.profile))
+
+        # Pages already encoded with the same edits and profile, by an earlier export
+        # or the size estimate, are reused as they are
+        page = page_cache.get(key)
+        if page is not None:
+            with self.cached_pages_lock:
+                self.cached_pages += 1
+            return page
+
+        # Workers wait for budget before decoding, so a batch of very large scans is
+        # encoded a few at a time instead of all at once
+        reserved = self.memory.reserve(page_memory(path))
+        try:
+            page = encode_page(path, settings, self.profile)
+        finally:
+            self.memory.release(reserved)
+
+        if not page.passthrough:
+            page_cache.put(key, page)
+        return page
+
+    def recognise(self, ocr_pool, path):
+        settings = self.images_settings.get(path)
+        key = result_key(path, settings, "ocr", OCR_MAX_SIDE)
+
+        text_lines = ocr_cache.get(key)
+        if text_lines is not None:
+            future = Future()
+            future.set_result(text_lines)
+            return future
+
+        def remember(done):
+            if not done.cancelled() and done.exception() is None:
+                ocr_cache.put(key, done.result())
+
+        future = ocr_pool.submit(recognise_page, path, settings)
+        future.add_done_callback(remember)
+        return future
+
+    def export(self, ordered_paths, save_path):
+        # Pages are streamed into a temporary file next to the target and only renamed
+        # into place once the PDF is complete, so a cancelled or failed export never
+        # leaves a truncated file behind
+        fd, temp_path = tempfile.mkstemp(
+            prefix=f".{os.path.basename(save_path)}.", suffix=".part",
+            dir=os.path.dirname(os.path.abspath(save_path))
+        )
+        os.close(fd)
+
+        try:
+            progress = self.write_pdf(ordered_paths, temp_path)
+            os.chmod(temp_path, 0o666 & ~_UMASK)
+            os.replace(temp_path, save_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return progress
+
+    def write_pdf(self, ordered_paths, pdf_path):
+        started = time.perf_counter()
+        input_bytes = 0
+        pending = deque()
+        paths = iter(ordered_paths)
+        progress = ExportProgress(0, len(ordered_paths), 0, 0, 0.0)
+        self.cached_pages = 0
+
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        ocr_pool = create_ocr_pool(self.ocr_workers()) if self.profile.ocr else None
+        text_pages = []
+        try:
+            with StreamingPdfWriter(pdf_path) as writer:
+                def submit_next():
+                    path = next(paths, None)
+                    if path is not None:
+                        ocr_future = None
+                        if ocr_pool is not None:
+                            ocr_future = self.recognise(ocr_pool, path)
+                        pending.append((pool.submit(self.encode, path), ocr_future))
+
+                for _ in range(self.window):
+                    submit_next()
+
+                while pending:
+                    if self.cancel_event.is_set():
+                        raise ExportCancelled()
+
+                    encode_future, ocr_future = pending.popleft()
+                    page = encode_future.result()
+                    text_lines = ocr_future.result() if ocr_future is not None else None
+                    submit_next()
+
+                    writer.add_image_page(
+                        page.data, page.width, page.height, page.colorspace, page.filter,
+                        page.page_size, page.image_rect, page.rotate, page.decode_parms, text_lines
+                    )
+                    input_bytes += page.input_bytes
+
+                    if text_lines is not None:
+                        text_pages.append({
+                            "page_number": len(writer.page_refs) - 1,
+                            "image_sha1": image_digest(page.data),
+                            "text": " ".join(text for text, _ in text_lines),
+                        })
+
+                    progress = ExportProgress(
+                        len(writer.page_refs), len(ordered_paths), input_bytes,
+                        writer.bytes_written, time.perf_counter() - started
+                    )
+                    if self.progress is not None:
+                        self.progress(progress)
+
+                # The recognised text travels inside the PDF, so loading it for QA
+                # later needs neither text extraction nor another OCR pass
+                if ocr_pool is not None:
+                    writer.attach_file(TEXT_LAYER_ATTACHMENT, text_layer_payload(text_pages))
+
+            if self.cached_pages:
+                print(f"[EXPORT] Reused {self.cached_pages} of {len(ordered_paths)} page(s) from the processed-page cache")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            if ocr_pool is not None:
+                ocr_pool.shutdown(wait=True, cancel_futures=True)
+
+        return progress
+
+    def estimate(self, ordered_paths, samples: int = 3):
+        if not ordered_paths:
+            return 0, 0.0
+
+        step = max(1, len(ordered_paths) // samples)
+        sampled = ordered_paths[::step][:samples]
+
+        sample_bytes = 0
+        sample_input = 0
+        started = time.perf_counter()
+        for path in sampled:
+            page = self.encode(path)
+            sample_bytes += len(page.data)
+            sample_input += page.input_bytes
+        sample_seconds = time.perf_counter() - started
+
+        total_input = sum(os.path.getsize(path) for path in ordered_paths)
+        ratio = total_input / max(1, sample_input)
+        seconds = sample_seconds * ratio / min(self.workers, len(ordered_paths))
+
+        if self.profile.ocr:
+            # OCR runs on reduced pages alongside the encoders, so it scales with the
+            # page count and the slower of the two sets the pace; the sampled pages
+            # stay in the OCR cache for the export itself
+            ocr_pool = create_ocr_pool(1)
+            started = time.perf_counter()
+            try:
+                for future in [self.recognise(ocr_pool, path) for path in sampled]:
+                    future.result()
+            finally:
+                ocr_pool.shutdown(wait=True, cancel_futures=True)
+            ocr_seconds = time.perf_counter() - started
+            seconds = max(seconds, ocr_seconds * len(ordered_paths) / len(sampled) / self.ocr_workers())
+
+        return int(sample_bytes * ratio), seconds
@@ -0,0 +1,160 @@
+class StreamingPdfWriter:
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.offsets = {}
+        self.page_refs = []
+        self.attachments = []
+        self.font_ref = None
+        self.next_object = 3
+
+        self.file.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    @property
+    def bytes_written(self):
+        return self.file.tell()
+
+    def allocate(self):
+        number = self.next_object
+        self.next_object += 1
+        return number
+
+    def write_object(self, number, body: bytes, stream: bytes | None = None):
+        self.offsets[number] = self.file.tell()
+        self.file.write(f"{number} 0 obj\n".encode("ascii"))
+        self.file.write(body)
+
+        if stream is not None:
+            self.file.write(b"\nstream\n")
+            self.file.write(stream)
+            self.file.write(b"\nendstream")
+
+        self.file.write(b"\nendobj\n")
+
+    def add_image_page(
+        self,
+        data: bytes,
+        width: int,
+        height: int,
+        colorspace: str = "DeviceRGB",
+        filter: str = "DCTDecode",
+        page_size: tuple[float, float] | None = None,
+        image_rect: tuple[float, float, float, float] | None = None,
+        rotate: int = 0,
+        decode_parms: str = "",
+        text_lines=None,
+    ):
+        page_width, page_height = page_size or (width, height)
+        x, y, placed_width, placed_height = image_rect or (0, 0, page_width, page_height)
+
+        image_ref = self.allocate()
+        self.write_object(
+            image_ref,
+            (
+                f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                f"/ColorSpace /{colorspace} /BitsPerComponent 8 /Filter /{filter} "
+                f"{decode_parms}/Length {len(data)} >>"
+            ).encode("ascii"),
+            data,
+        )
+
+        content = f"q {placed_width:.4f} 0 0 {placed_height:.4f} {x:.4f} {y:.4f} cm /Im0 Do Q".encode("ascii")
+        fonts = ""
+        if text_lines:
+            content += self.text_layer(text_lines, (x, y, placed_width, placed_height), rotate % 360)
+            fonts = f"/Font << /F0 {self.text_font()} 0 R >> "
+
+        content_ref = self.allocate()
+        self.write_object(content_ref, f"<< /Length {len(content)} >>".encode("ascii"), content)
+
+        page_ref = self.allocate()
+        self.write_object(
+            page_ref,
+            (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width:.4f} {page_height:.4f}] "
+                f"/Rotate {rotate % 360} /Resources << /XObject << /Im0 {image_ref} 0 R >> {fonts}>> "
+                f"/Contents {content_ref} 0 R >>"
+            ).encode("ascii"),
+        )
+        self.page_refs.append(page_ref)
+
+        return page_ref
+
+    def text_font(self):
+        if self.font_ref is None:
+            self.font_ref = self.allocate()
+            self.write_object(
+                self.font_ref,
+                b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+            )
+
+        return self.font_ref
+
+    def text_layer(self, text_lines, image_rect, rotate):
+        # Lines come as boxes normalised to the image as the reader sees it, i.e. after
+        # /Rotate. They are mapped back into unrotated page space and drawn with render
+        # mode 3, which is invisible but still selectable and searchable
+        x, y, width, height = image_rect
+        shown_width, shown_height = (width, height) if rotate in (0, 180) else (height, width)
+        cos, sin = {0: (1, 0), 90: (0, 1), 180: (-1, 0), 270: (0, -1)}[rotate]
+
+        def to_page(u, v):
+            s, t = {0: (u, v), 90: (v, 1 - u), 180: (1 - u, 1 - v), 270: (1 - v, u)}[rotate]
+            return x + s * width, y + (1 - t) * height
+
+        commands = [b" BT 3 Tr"]
+        for text, (left, top, right, bottom) in text_lines:
+            encoded = text.encode("cp1252", errors="replace")
+            if not encoded.strip():
+                continue
+
+            line_height = (bottom - top) * shown_height
+            font_size = max(1.0, line_height * 0.85)
+            origin_x, origin_y = to_page(left, bottom - (bottom - top) * 0.15)
+            natural_width = len(encoded) * font_size * 0.5
+            stretch = 100 * (right - left) * shown_width / natural_width
+
+            escaped = encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+            commands.append(
+                f" /F0 {font_size:.2f} Tf {stretch:.2f} Tz {cos} {sin} {-sin} {cos} {origin_x:.2f} {origin_y:.2f} Tm (".encode("ascii")
+                + escaped + b") Tj"
+            )
+        commands.append(b" ET")
+
+        return b"".join(commands)
+
+    def attach_file(self, name, data: bytes):
+        stream_ref = self.allocate()
+        self.write_object(stream_ref, f"<< /Type /EmbeddedFile /Length {len(data)} >>".encode("ascii"), data)
+
+        spec_ref = self.allocate()
+        self.write_object(spec_ref, f"<< /Type /Filespec /F ({name}) /UF ({name}) /EF << /F {stream_ref} 0 R >> >>".encode("ascii"))
+        self.attachments.append((name, spec_ref))
+
+    def close(self):
+        kids = " ".join(f"{ref} 0 R" for ref in self.page_refs)
+        self.write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_refs)} >>".encode("ascii"))
+        names = ""
+        if self.attachments:
+            entries = " ".join(f"({name}) {ref} 0 R" for name, ref in sorted(self.attachments))
+            names = f"/Names << /EmbeddedFiles << /Names [{entries}] >> >> "
+        self.write_object(1, f"<< /Type /Catalog /Pages 2 0 R {names}>>".encode("ascii"))
+
+        xref_offset = self.file.tell()
+        self.file.write(f"xref\n0 {self.next_object}\n".encode("ascii"))
+        self.file.write(b"0000000000 65535 f \n")
+        for number in range(1, self.next_object):
+            self.file.write(f"{self.offsets[number]:010d} 00000 n \n".encode("ascii"))
+
+        self.file.write(
+            f"trailer\n<< /Size {self.next_object} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+        )
+        self.file.close()
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from app.cache import cache_dir, hash_parts
+
+
+PREVIEW_CACHE_BYTES = 256 * 1024 * 1024
+PAGE_CACHE_BYTES = 256 * 1024 * 1024
+OCR_CACHE_BYTES = 16 * 1024 * 1024
+SPILL_BYTES = 2 * 1024 * 1024 * 1024
+MAX_DIGESTS = 4096
+
+DEFAULT_SETTINGS = {
+    'rotation': {'angle': 0},
+    'brightness': {'factor': 1.0},
+    'contrast': {'factor': 1.0},
+    'saturation': {'factor': 1.0},
+}
+
+
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def file_digest(path):
+    # Content hashes are remembered per file version, so a file is only read in
+    # full again after it changes on disk
+    stat = os.stat(path)
+    version = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    with _digests_lock:
+        if version in _digests:
+            _digests.move_to_end(version)
+            return _digests[version]
+
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+    with _digests_lock:
+        _digests[version] = digest.hexdigest()
+        while len(_digests) > MAX_DIGESTS:
+            _digests.popitem(last=False)
+
+    return _digests[version]
+
+
+def settings_digest(settings):
+    # Images that were never opened in the editor have no settings at all; they
+    # share a key with images whose sliders are all back at neutral
+    settings = settings or {}
+    canonical = {name: {**defaults, **settings.get(name, {})} for name, defaults in DEFAULT_SETTINGS.items()}
+    return hash_parts(json.dumps(canonical, sort_keys=True, separators=(",", ":")))
+
+
+def result_key(path, settings, *variant):
+    return hash_parts(file_digest(path), settings_digest(settings), *(repr(part) for part in variant))
+
+
+class ProcessedCache:
+    def __init__(self, max_bytes, size, spill_namespace=None, spill_bytes: int = SPILL_BYTES):
+        self.max_bytes = max_bytes
+        self.size = size
+        self.spill_namespace = spill_namespace
+        self.spill_bytes = spill_bytes
+        self.spill_used = None
+        self.used = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        value = self.load_spilled(key)
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if value is not None:
+            self.put(key, value, spilled=True)
+        return value
+
+    def put(self, key, value, spilled=False):
+        size = self.size(value)
+        if size > self.max_bytes:
+            return
+
+        evicted = []
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.used -= previous[1]
+
+            self.entries[key] = (value, size, spilled)
+            self.used += size
+
+            while self.used > self.max_bytes:
+                evicted_key, (evicted_value, evicted_size, evicted_spilled) = self.entries.popitem(last=False)
+                self.used -= evicted_size
+                if not evicted_spilled:
+                    evicted.append((evicted_key, evicted_value))
+
+        # Disk writes happen outside the lock so other workers keep hitting memory
+        for evicted_key, evicted_value in evicted:
+            self.spill(evicted_key, evicted_value)
+
+    def spill_path(self, key):
+        return cache_dir(self.spill_namespace) / f"{key}.pickle"
+
+    def load_spilled(self, key):
+        if self.spill_namespace is None:
+            return None
+
+        path = self.spill_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+
+        # Touching the file keeps recently used results out of the next prune
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def spill(self, key, value):
+        if self.spill_namespace is None:
+            return
+
+        path = self.spill_path(key)
+        if path.exists():
+            return
+
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[ERROR] Failed to spill processed result: {e}")
+            if tmp_path.exists():
+                tmp_path.unlink()
+            return
+
+        with self.lock:
+            if self.spill_used is None:
+                self.spill_used = sum(entry.stat().st_size for entry in cache_dir(self.spill_namespace).glob("*.pickle"))
+            else:
+                self.spill_used += path.stat().st_size
+            over_budget = self.spill_used > self.spill_bytes
+
+        if over_budget:
+            self.prune_spilled()
+
+    def prune_spilled(self):
+        files = []
+        for entry in cache_dir(self.spill_namespace).glob("*.pickle"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry))
+
+        used = sum(size for _, size, _ in files)
+        for _, size, entry in sorted(files):
+            if used <= self.spill_bytes * 0.9:
+                break
+            try:
+                entry.unlink()
+                used -= size
+            except OSError:
+                pass
+
+        with self.lock:
+            self.spill_used = used
+
+    def clear(self, spilled=False):
+        with self.lock:
+            self.entries.clear()
+            self.used = 0
+
+        if spilled and self.spill_namespace is not None:
+            for entry in cache_dir(self.spill_namespace).glob("*.pickle"):
+                try:
+                    entry.unlink()
+                except OSError:
+                    pass
+            with self.lock:
+                self.spill_used = 0
+
+
+def image_bytes(image):
+    return image.width * image.height * len(image.getbands())
+
+
+def page_bytes(page):
+    return len(page.data) + 256
+
+
+def lines_bytes(lines):
+    return sum(len(text) + 64 for text, _ in lines) + 64
+
+
+preview_cache = ProcessedCache(PREVIEW_CACHE_BYTES, image_bytes)
+page_cache = ProcessedCache(PAGE_CACHE_BYTES, page_bytes, spill_namespace="processed_pages")
+ocr_cache = ProcessedCache(OCR_CACHE_BYTES, lines_bytes, spill_namespace="ocr_lines")
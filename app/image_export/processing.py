@@ -0,0 +1,124 @@
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def load_proxy(path, max_size):
+    with Image.open(path) as image:
+        image.draft("RGB", max_size)
+        image = image.convert("RGBA")
+
+    image.thumbnail(max_size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return image
+
+
+class ProxyCache:
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, max_size):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size, tuple(max_size))
+
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                return self._images[key]
+
+        image = load_proxy(path, max_size)
+
+        with self._lock:
+            self._images[key] = image
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+
+        return image
+
+
+proxy_cache = ProxyCache()
+
+
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+STRIP_BYTES = 32 * 1024 * 1024
+
+
+def colour_matrix(brightness, contrast, saturation, mean_luma):
+    # brightness, contrast and saturation are each affine in RGB, so the whole
+    # chain collapses into one 3x4 matrix that Pillow applies in a single pass
+    scale = contrast * brightness
+    offset = (1 - contrast) * brightness * mean_luma
+    matrix = []
+
+    for channel in range(3):
+        row = [scale * (1 - saturation) * weight for weight in LUMA_WEIGHTS]
+        row[channel] += scale * saturation
+        matrix.extend(row + [offset])
+
+    return tuple(matrix)
+
+
+def mean_luma(image, max_samples: int = 1 << 20):
+    factor = max(1, int((image.width * image.height / max_samples) ** 0.5))
+    sample = image.reduce(factor) if factor > 1 else image
+    histogram = sample.convert("L").histogram()
+
+    return int(sum(value * count for value, count in enumerate(histogram)) / max(1, sum(histogram)) + 0.5)
+
+
+def image_strips(image, strip_bytes: int = STRIP_BYTES):
+    rows = max(1, strip_bytes // max(1, image.width * len(image.getbands())))
+    for top in range(0, image.height, rows):
+        yield 0, top, image.width, min(image.height, top + rows)
+
+
+def apply_colour_matrix(image, matrix):
+    if image.mode == "RGBA":
+        alpha = image.getchannel("A")
+        image = image.convert("RGB").convert("RGB", matrix)
+        image.putalpha(alpha)
+        return image
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    return image.convert("RGB", matrix)
+
+
+def adjust_colours(image, brightness=1.0, contrast=1.0, saturation=1.0, in_place=False):
+    if brightness == 1.0 and contrast == 1.0 and saturation == 1.0:
+        return image
+
+    matrix = colour_matrix(brightness, contrast, saturation, mean_luma(image))
+
+    if in_place and image.mode in ("RGB", "RGBA"):
+        # Callers that own the image get it adjusted one strip at a time, so a large
+        # scan only ever exists once plus a single strip instead of twice
+        for box in image_strips(image):
+            image.paste(apply_colour_matrix(image.crop(box), matrix), box)
+        return image
+
+    return apply_colour_matrix(image, matrix)
+
+
+def has_colour_edits(settings):
+    return any(settings[name]['factor'] != 1.0 for name in ('brightness', 'contrast', 'saturation'))
+
+
+def adjust_image(image, settings, in_place=False):
+    image = adjust_colours(
+        image,
+        settings['brightness']['factor'],
+        settings['contrast']['factor'],
+        settings['saturation']['factor'],
+        in_place,
+    )
+
+    angle = settings['rotation']['angle']
+    if angle != 0:
+        image = image.rotate(-angle, expand=True)
+
+    return image
@@ -0,0 +1,58 @@
+from dataclasses import dataclass, replace
+
+
+PAGE_SIZES = {
+    "A4": (595.28, 841.89),
+    "Letter": (612.0, 792.0),
+}
+
+
+@dataclass(frozen=True)
+class ExportProfile:
+    name: str
+    dpi: int | None = None
+    compression: str = "jpeg"
+    jpeg_quality: int = 90
+    jpx_quality_db: float = 42.0
+    detect_grayscale: bool = False
+    page_size: str | None = None
+    ocr: bool = False
+
+
+EXPORT_PROFILES = {
+    "Original": ExportProfile("Original"),
+    "Screen": ExportProfile("Screen", dpi=110, compression="jpeg", jpeg_quality=70, detect_grayscale=True, page_size="A4"),
+    "Print": ExportProfile("Print", dpi=300, compression="jpeg", jpeg_quality=90, detect_grayscale=True, page_size="A4"),
+    "Archive": ExportProfile("Archive", dpi=300, compression="jpx", jpx_quality_db=46.0, page_size="A4"),
+    "Lossless": ExportProfile("Lossless", compression="flate", detect_grayscale=True),
+}
+
+DEFAULT_PROFILE = EXPORT_PROFILES["Original"]
+
+
+def encoding_profile(profile):
+    # The name and the OCR text layer don't change how a page is encoded, so profiles
+    # that differ only in those share encoded pages
+    return replace(profile, name="", ocr=False)
+
+
+def page_layout(width, height, profile):
+    if profile.page_size is None:
+        return (width, height), (0, 0, width, height), (width, height)
+
+    page_width, page_height = PAGE_SIZES[profile.page_size]
+    if (width > height) != (page_width > page_height):
+        page_width, page_height = page_height, page_width
+
+    scale = min(page_width / width, page_height / height)
+    placed_width, placed_height = width * scale, height * scale
+    image_rect = ((page_width - placed_width) / 2, (page_height - placed_height) / 2, placed_width, placed_height)
+
+    target = (width, height)
+    if profile.dpi is not None:
+        effective_dpi = 72 / scale
+        if effective_dpi > profile.dpi:
+            factor = profile.dpi / effective_dpi
+            target = (max(1, round(width * factor)), max(1, round(height * factor)))
+
+    return (page_width, page_height), image_rect, target
@@ -0,0 +1,108 @@
+import copy
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+from PySide6.QtGui import QImage
+
+from .processed_cache import preview_cache, result_key
+from .processing import adjust_image, proxy_cache
+
+
+def to_qimage(image):
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+
+    # Pillow only hands out its pixels as a copy, so tobytes is the one copy made
+    # here; PySide keeps those bytes alive for as long as any QImage shares them
+    return QImage(image.tobytes("raw", "RGBA"), image.width, image.height, image.width * 4, QImage.Format_RGBA8888)
+
+
+class RenderSignals(QObject):
+    finished = Signal(int, QImage)
+
+
+class RenderTask(QRunnable):
+    def __init__(self, generation, path, settings, max_size):
+        super().__init__()
+        self.generation = generation
+        self.path = path
+        self.settings = settings
+        self.max_size = max_size
+        self.signals = RenderSignals()
+
+    def run(self):
+        try:
+            qt_image = to_qimage(self.processed_image())
+        except Exception as e:
+            print(f"[ERROR] Failed to render preview for {self.path}: {e}")
+            qt_image = QImage()
+
+        self.signals.finished.emit(self.generation, qt_image)
+
+    def processed_image(self):
+        # Going back to an image, or a slider back to a value it already had, reuses
+        # the earlier result instead of adjusting the proxy again
+        key = result_key(self.path, self.settings, tuple(self.max_size))
+        image = preview_cache.get(key)
+        if image is not None:
+            return image
+
+        proxy = proxy_cache.get(self.path, self.max_size)
+        image = adjust_image(proxy, self.settings)
+        if image is not proxy:
+            preview_cache.put(key, image)
+
+        return image
+
+
+class PreviewRenderer(QObject):
+    rendered = Signal(QImage)
+
+    def __init__(self, max_size, debounce_ms: int = 16, parent=None):
+        super().__init__(parent)
+        self.max_size = max_size
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(debounce_ms)
+        self.debounce_timer.timeout.connect(self.start_pending)
+
+        self.generation = 0
+        self.pending = None
+        self.busy = False
+        self.active_task = None
+
+    def request(self, path, settings):
+        self.generation += 1
+        self.pending = (self.generation, path, copy.deepcopy(settings))
+        self.debounce_timer.start()
+
+    def start_pending(self):
+        if self.busy or self.pending is None:
+            return
+
+        generation, path, settings = self.pending
+        self.pending = None
+        self.busy = True
+
+        task = RenderTask(generation, path, settings, self.max_size)
+        task.signals.finished.connect(self.on_finished)
+        task.setAutoDelete(False)
+        self.active_task = task
+        self.pool.start(task)
+
+    def on_finished(self, generation, image):
+        self.busy = False
+        self.active_task = None
+
+        if generation == self.generation and not image.isNull():
+            self.rendered.emit(image)
+
+        self.start_pending()
+
+    def stop(self):
+        self.debounce_timer.stop()
+        self.pending = None
+        self.pool.waitForDone()
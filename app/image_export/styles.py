@@ -39,17 +39,3 @@ upload_button_style = """
         background-color: #0056b3;
     }
 """
-
-thumbnail_style = """
-    QLabel {
-        border-radius: 8px;
-        background-color: #2a2a2a;
-        border: 2px solid transparent;
-        box-shadow: 0px 0px 8px rgba(0,0,0,0.4);
-    }
-
-    QLabel:hover {
-        border: 2px solid #5dade2;
-        background-color: #333333;
-    }
-"""
\ No newline at end of file
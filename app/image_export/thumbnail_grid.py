@@ -0,0 +1,224 @@
+import os
+from collections import OrderedDict
+
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QPoint, QRect, QSize, QTimer, Signal
+from PySide6.QtGui import QColor, QPainter, QPen, QPixmap
+from PySide6.QtWidgets import QAbstractItemView, QListView, QStyle, QStyledItemDelegate
+
+from .thumbnails import ThumbnailLoader
+
+
+CELL_SIZE = 120
+THUMBNAIL_DISPLAY_SIZE = 100
+PATH_ROLE = Qt.UserRole + 1
+
+
+class ThumbnailModel(QAbstractListModel):
+    def __init__(self, max_cached: int = 1000, parent=None):
+        super().__init__(parent)
+        self.paths = []
+        self.rows = {}
+        self.max_cached = max_cached
+        self.pixmaps = OrderedDict()
+        self.requested = set()
+        self.device_pixel_ratio = 1.0
+
+        self.loader = ThumbnailLoader(parent=self)
+        self.loader.loaded.connect(self.on_thumbnail_loaded)
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self.loader.cancel()
+        self.paths = list(paths)
+        self.rows = {path: row for row, path in enumerate(self.paths)}
+        self.pixmaps.clear()
+        self.requested.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        path = self.paths[index.row()]
+
+        if role == PATH_ROLE:
+            return path
+        if role == Qt.ToolTipRole:
+            return os.path.basename(path)
+        if role == Qt.DecorationRole:
+            return self.thumbnail(path)
+
+        return None
+
+    def thumbnail(self, path):
+        pixmap = self.pixmaps.get(path)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(path)
+            return pixmap
+
+        if path not in self.requested:
+            self.requested.add(path)
+            self.loader.request(path)
+
+        return None
+
+    def retain(self, paths):
+        dropped = self.loader.retain(paths)
+        self.requested.difference_update(dropped)
+        return dropped
+
+    def on_thumbnail_loaded(self, path, thumbnail):
+        self.requested.discard(path)
+        row = self.rows.get(path)
+        if row is None:
+            return
+
+        size = round(THUMBNAIL_DISPLAY_SIZE * self.device_pixel_ratio)
+        pixmap = QPixmap.fromImage(thumbnail).scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        pixmap.setDevicePixelRatio(self.device_pixel_ratio)
+
+        self.pixmaps[path] = pixmap
+        while len(self.pixmaps) > self.max_cached:
+            self.pixmaps.popitem(last=False)
+
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def moveRows(self, source_parent, source_row, count, destination_parent, destination_child):
+        if source_parent.isValid() or destination_parent.isValid():
+            return False
+        if source_row <= destination_child <= source_row + count:
+            return False
+
+        self.beginMoveRows(QModelIndex(), source_row, source_row + count - 1, QModelIndex(), destination_child)
+        moved = self.paths[source_row: source_row + count]
+        del self.paths[source_row: source_row + count]
+        insert_at = destination_child - count if destination_child > source_row else destination_child
+        self.paths[insert_at:insert_at] = moved
+        for row in range(min(source_row, insert_at), max(source_row, insert_at) + count):
+            self.rows[self.paths[row]] = row
+        self.endMoveRows()
+
+        return True
+
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    def sizeHint(self, option, index):
+        return QSize(CELL_SIZE, CELL_SIZE)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        cell = option.rect.adjusted(5, 5, -5, -5)
+        hovered = option.state & QStyle.State_MouseOver
+        selected = option.state & QStyle.State_Selected
+
+        painter.setBrush(QColor("#333333") if hovered else QColor("#2a2a2a"))
+        painter.setPen(QPen(QColor("#5dade2"), 2) if hovered or selected else Qt.NoPen)
+        painter.drawRoundedRect(cell, 8, 8)
+
+        pixmap = index.data(Qt.DecorationRole)
+        if pixmap is not None:
+            size = pixmap.deviceIndependentSize().toSize()
+            target = QRect(0, 0, size.width(), size.height())
+            target.moveCenter(cell.center())
+            painter.drawPixmap(target, pixmap)
+
+        painter.restore()
+
+
+class ThumbnailGridView(QListView):
+    imageActivated = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        # ListMode with a wrapping left-to-right flow looks like a grid, and unlike
+        # IconMode it turns internal drag moves into model.moveRows calls
+        self.setViewMode(QListView.ListMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(True)
+        self.setResizeMode(QListView.Adjust)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(200)
+        self.setSpacing(5)
+        self.setMouseTracking(True)
+
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setDragDropMode(QAbstractItemView.InternalMove)
+        self.setDefaultDropAction(Qt.MoveAction)
+        self.setDragEnabled(True)
+        self.setAcceptDrops(True)
+        self.setDropIndicatorShown(True)
+
+        self.thumbnail_model = ThumbnailModel(parent=self)
+        self.thumbnail_model.device_pixel_ratio = self.devicePixelRatioF()
+        self.setModel(self.thumbnail_model)
+        self.setItemDelegate(ThumbnailDelegate(self))
+
+        self.doubleClicked.connect(lambda index: self.imageActivated.emit(index.data(PATH_ROLE)))
+
+        self.retain_timer = QTimer(self)
+        self.retain_timer.setSingleShot(True)
+        self.retain_timer.setInterval(50)
+        self.retain_timer.timeout.connect(self.retain_visible)
+
+    def scrollContentsBy(self, dx, dy):
+        super().scrollContentsBy(dx, dy)
+        self.retain_timer.start()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.retain_timer.start()
+
+    def probe_row(self, x, top, bottom, step):
+        # Probes down (or up) the viewport for the first item, skipping the spacing
+        # between lines and any empty space below the last one
+        for y in range(top, bottom, step):
+            index = self.indexAt(QPoint(x, y))
+            if index.isValid():
+                return index.row()
+        return None
+
+    def visible_rows(self):
+        rect = self.viewport().rect()
+        line = CELL_SIZE + 2 * self.spacing()
+        x = self.spacing() + CELL_SIZE // 2
+        per_line = max(1, rect.width() // line)
+
+        first = self.probe_row(x, rect.top(), rect.bottom(), 4)
+        last_line = self.probe_row(x, rect.bottom(), rect.top(), -4)
+        if first is None or last_line is None:
+            return range(0)
+
+        # One line either side stays wanted so a small scroll back doesn't reload
+        return range(max(0, first - per_line), min(len(self.thumbnail_model.paths), last_line + 2 * per_line))
+
+    def retain_visible(self):
+        rows = self.visible_rows()
+        if not rows:
+            return
+
+        paths = self.thumbnail_model.paths
+        # Rows still on screen whose load was dropped are requested again when painted
+        if self.thumbnail_model.retain({paths[row] for row in rows}):
+            self.viewport().update()
+
+    def set_paths(self, paths):
+        self.thumbnail_model.set_paths(paths)
+
+    def ordered_paths(self):
+        return list(self.thumbnail_model.paths)
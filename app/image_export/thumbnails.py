@@ -0,0 +1,107 @@
+import os
+import threading
+
+from PIL import Image
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtGui import QImage
+
+from app.cache import cache_dir, hash_parts
+from .render import to_qimage
+
+
+THUMBNAIL_SIZE = 240
+
+
+def thumbnail_cache_path(path, size):
+    stat = os.stat(path)
+    key = hash_parts(os.path.abspath(path), str(stat.st_mtime_ns), str(stat.st_size), str(size))
+    return cache_dir("thumbnails") / f"{key}.png"
+
+
+def decode_thumbnail(path, size):
+    with Image.open(path) as image:
+        image.draft("RGB", (size, size))
+        image = image.convert("RGBA")
+
+    image.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return image
+
+
+def load_thumbnail(path, size=THUMBNAIL_SIZE):
+    cached = thumbnail_cache_path(path, size)
+
+    if cached.exists():
+        thumbnail = QImage(str(cached))
+        if not thumbnail.isNull():
+            return thumbnail
+
+    image = decode_thumbnail(path, size)
+    tmp_path = cached.with_suffix(f".{threading.get_ident()}.tmp")
+    image.save(tmp_path, "PNG")
+    os.replace(tmp_path, cached)
+
+    return to_qimage(image)
+
+
+class ThumbnailSignals(QObject):
+    loaded = Signal(int, str, QImage)
+
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, generation, path, size, signals):
+        super().__init__()
+        self.generation = generation
+        self.path = path
+        self.size = size
+        self.signals = signals
+
+    def run(self):
+        try:
+            thumbnail = load_thumbnail(self.path, self.size)
+        except Exception as e:
+            print(f"[ERROR] Failed to load thumbnail for {self.path}: {e}")
+            thumbnail = QImage()
+
+        self.signals.loaded.emit(self.generation, self.path, thumbnail)
+
+
+class ThumbnailLoader(QObject):
+    loaded = Signal(str, QImage)
+
+    def __init__(self, size=THUMBNAIL_SIZE, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.generation = 0
+        self.tasks = {}
+
+        self.pool = QThreadPool(self)
+        self.signals = ThumbnailSignals(self)
+        self.signals.loaded.connect(self.on_loaded)
+
+    def request(self, path):
+        task = ThumbnailTask(self.generation, path, self.size, self.signals)
+        task.setAutoDelete(False)
+        self.tasks[(self.generation, path)] = task
+        self.pool.start(task)
+
+    def retain(self, paths):
+        # Loads still queued for thumbnails that scrolled away are dropped, so a fast
+        # scroll doesn't leave the whole list queued ahead of what is on screen
+        dropped = []
+        for key, task in list(self.tasks.items()):
+            if key[1] not in paths and self.pool.tryTake(task):
+                del self.tasks[key]
+                dropped.append(key[1])
+        return dropped
+
+    def cancel(self):
+        self.generation += 1
+        for key, task in list(self.tasks.items()):
+            if self.pool.tryTake(task):
+                del self.tasks[key]
+
+    def on_loaded(self, generation, path, thumbnail):
+        self.tasks.pop((generation, path), None)
+
+        if generation == self.generation and not thumbnail.isNull():
+            self.loaded.emit(path, thumbnail)
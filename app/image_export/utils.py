@@ -5,20 +5,25 @@ from PySide6.QtWidgets import (
     QHBoxLayout,
     QPushButton,
     QWidget,
-    QFrame,
     QSizePolicy,
-    QLayout,
-    QWidgetItem,
     QScrollArea,
     QStackedWidget,
     QListWidget,
     QListWidgetItem,
+    QComboBox,
+    QFormLayout,
+    QDialogButtonBox,
+    QCheckBox,
 )
 
-from PySide6.QtGui import QPixmap, QImage, QDrag, QGuiApplication, QWheelEvent, QPainter
-from PySide6.QtCore import Qt, Signal, QPoint, QRect, QSize, QMimeData
-from PIL import Image, ImageEnhance
+from PySide6.QtGui import QPixmap, QGuiApplication, QWheelEvent, QPainter
+from PySide6.QtCore import Qt, Signal, QPoint, QRect, QRectF, QSize, QThreadPool, QTimer
 import math
+from dataclasses import replace
+
+from .export_job import EstimateTask
+from .profiles import EXPORT_PROFILES, PAGE_SIZES
+from .render import PreviewRenderer
 
 
 class ZoomableImageLabel(QLabel):
@@ -27,10 +32,18 @@ class ZoomableImageLabel(QLabel):
         self.setAlignment(Qt.AlignCenter)
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self._pixmap = None
+        self._pyramid = None
         self._scale_factor = 1.0
+        self._smooth = True
+
+        self.smooth_timer = QTimer(self)
+        self.smooth_timer.setSingleShot(True)
+        self.smooth_timer.setInterval(150)
+        self.smooth_timer.timeout.connect(self.finish_zoom)
 
     def setPixmap(self, pixmap):
         self._pixmap = pixmap
+        self._pyramid = None
         self._scale_factor = 1.0
         self.update_scaled_pixmap()
 
@@ -40,16 +53,80 @@ class ZoomableImageLabel(QLabel):
             self._scale_factor *= 1.1
         else:
             self._scale_factor /= 1.1
+
+        self._smooth = False
         self.update_scaled_pixmap()
+        self.smooth_timer.start()
+
+    def finish_zoom(self):
+        self._smooth = True
+        self.update()
+
+    def build_pyramid(self):
+        levels = [self._pixmap]
+
+        while min(levels[-1].width(), levels[-1].height()) > 128:
+            last = levels[-1]
+            levels.append(last.scaled(last.width() // 2, last.height() // 2, Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+
+        return levels
+
+    def pyramid_level(self, target_width):
+        if target_width >= self._pixmap.width() / 2:
+            return self._pixmap
+
+        if self._pyramid is None:
+            self._pyramid = self.build_pyramid()
+
+        level = self._pyramid[0]
+        for candidate in self._pyramid[1:]:
+            if candidate.width() < target_width:
+                break
+            level = candidate
+
+        return level
+
+    def scaled_size(self):
+        return self._pixmap.size() * self._scale_factor
+
+    def sizeHint(self):
+        if self._pixmap:
+            return self.scaled_size()
+        return super().sizeHint()
 
     def update_scaled_pixmap(self):
         if self._pixmap:
-            scaled = self._pixmap.scaled(
-                self._pixmap.size() * self._scale_factor,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-            super().setPixmap(scaled)
+            self.setMinimumSize(self.scaled_size())
+            self.updateGeometry()
+            self.update()
+
+    def paintEvent(self, event):
+        if not self._pixmap:
+            return super().paintEvent(event)
+
+        size = self.scaled_size()
+        target = QRectF(
+            (self.width() - size.width()) / 2,
+            (self.height() - size.height()) / 2,
+            size.width(),
+            size.height()
+        )
+        visible = QRectF(event.rect()).intersected(target)
+        if visible.isEmpty():
+            return
+
+        level = self.pyramid_level(target.width())
+        ratio = level.width() / target.width()
+        source = QRectF(
+            (visible.x() - target.x()) * ratio,
+            (visible.y() - target.y()) * ratio,
+            visible.width() * ratio,
+            visible.height() * ratio
+        )
+
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, self._smooth)
+        painter.drawPixmap(visible, level, source)
 
 
 
@@ -68,6 +145,9 @@ class ImagePreviewerDialog(QDialog):
         self.images_settings = images_settings if images_settings is not None else {}
         self.init_image_settings()
 
+        self.renderer = PreviewRenderer(self.preview_size(), parent=self)
+        self.renderer.rendered.connect(self.show_rendered)
+
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
         self.scroll_area.setAlignment(Qt.AlignCenter)
@@ -209,26 +289,24 @@ class ImagePreviewerDialog(QDialog):
         self.saturation_slider.setValue(int(self.images_settings[path]['saturation']['factor'] * 100))
         self.render_image()
 
+    def preview_size(self):
+        screen = QGuiApplication.primaryScreen()
+        size = screen.availableGeometry().size() * screen.devicePixelRatio()
+        return (size.width(), size.height())
+
     def render_image(self):
         path = self.image_paths[self.index]
-        image = Image.open(path).convert("RGBA")
-
-        settings = self.images_settings[path]
-        image = image.rotate(-settings['rotation']['angle'], expand=True)
-        image = ImageEnhance.Brightness(image).enhance(settings['brightness']['factor'])
-        image = ImageEnhance.Contrast(image).enhance(settings['contrast']['factor'])
-        image = ImageEnhance.Color(image).enhance(settings['saturation']['factor'])
-
-        qt_image = QImage(
-            image.tobytes("raw", "RGBA"),
-            image.width,
-            image.height,
-            QImage.Format_RGBA8888
-        )
+        self.renderer.request(path, self.images_settings[path])
+
+    def show_rendered(self, qt_image):
         pixmap = QPixmap.fromImage(qt_image)
         self.image_label.setPixmap(pixmap)
         self.image_label.adjustSize()
 
+    def done(self, result):
+        self.renderer.stop()
+        super().done(result)
+
     def reset_all_settings(self):
         for path in self.image_paths:
             self.images_settings[path] = {
@@ -252,164 +330,6 @@ class ImagePreviewerDialog(QDialog):
 
 
 
-class ThumbnailLabel(QLabel):
-    doubleClicked = Signal(str)
-
-    def __init__(self, image_path, parent=None):
-        super().__init__(parent)
-        self.image_path = image_path
-        self.setFixedSize(100, 100)
-        self.setScaledContents(True)
-
-        pixmap = QPixmap(image_path)
-        self.setPixmap(pixmap.scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        self.setFrameShape(QFrame.StyledPanel)
-        self.setStyleSheet("margin: 5px;")
-        self.setAcceptDrops(True)
-
-    def mouseDoubleClickEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.doubleClicked.emit(self.image_path)
-
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            drag = QDrag(self)
-            mime = QMimeData()
-            mime.setText(self.image_path)
-            drag.setMimeData(mime)
-            drag.setPixmap(self.pixmap().scaled(80, 80, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-            drag.setHotSpot(event.pos())
-            drag.exec(Qt.MoveAction)
-
-
-
-class ThumbnailContainer(QWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setAcceptDrops(True)
-        self.container_layout = FlowLayout()
-        self.setLayout(self.container_layout)
-
-    def add_thumbnail(self, thumb: ThumbnailLabel):
-        self.container_layout.addWidget(thumb)
-
-    def dragEnterEvent(self, event):
-        if event.mimeData().hasText():
-            event.acceptProposedAction()
-
-    def dragMoveEvent(self, event):
-        event.acceptProposedAction()
-
-    def dropEvent(self, event):
-        path = event.mimeData().text()
-        dragged = None
-        index_to_remove = -1
-
-        for i in range(self.container_layout.count()):
-            item = self.container_layout.itemAt(i)
-            if isinstance(item.widget(), ThumbnailLabel) and item.widget().image_path == path:
-                dragged = item.widget()
-                index_to_remove = i
-                break
-
-        if dragged:
-            pos = event.position().toPoint()
-            target_index = self._find_insert_index(pos)
-
-            if 0 <= index_to_remove < self.container_layout.count():
-                item = self.container_layout.takeAt(index_to_remove)
-                item.widget().setParent(None) 
-
-            self.container_layout._items.insert(target_index, QWidgetItem(dragged))
-            self.container_layout.invalidate()
-            self.container_layout.update()
-            self.container_layout.setGeometry(self.geometry())
-            event.acceptProposedAction()
-
-    def _find_insert_index(self, pos: QPoint):
-        for i in range(self.container_layout.count()):
-            item = self.container_layout.itemAt(i)
-            if item.widget().geometry().contains(pos):
-                return i
-        return self.container_layout.count()
-
-
-
-class FlowLayout(QLayout):
-    def __init__(self, parent=None, margin=0, spacing=10):
-        super().__init__(parent)
-        self._items = []
-        self.setSpacing(spacing)
-        self.setContentsMargins(margin, margin, margin, margin)
-
-    def addItem(self, item):
-        self._items.append(item)
-
-    def count(self):
-        return len(self._items)
-
-    def itemAt(self, index):
-        if 0 <= index < len(self._items):
-            return self._items[index]
-        return None
-
-    def takeAt(self, index):
-        if 0 <= index < len(self._items):
-            return self._items.pop(index)
-        return None
-
-    def expandingDirections(self):
-        return Qt.Orientations(Qt.Orientation(0))
-
-    def hasHeightForWidth(self):
-        return True
-
-    def heightForWidth(self, width):
-        return self.doLayout(QRect(0, 0, width, 0), True)
-
-    def setGeometry(self, rect):
-        super().setGeometry(rect)
-        self.doLayout(rect, False)
-
-    def _create_item(self, widget):
-        self.addChildWidget(widget)
-        return QWidgetItem(widget)
-
-    def sizeHint(self):
-        return self.minimumSize()
-
-    def minimumSize(self):
-        size = QSize()
-        for item in self._items:
-            size = size.expandedTo(item.minimumSize())
-        size += QSize(2 * self.contentsMargins().top(), 2 * self.contentsMargins().top())
-        return size
-
-    def doLayout(self, rect, testOnly):
-        x = rect.x()
-        y = rect.y()
-        lineHeight = 0
-
-        for item in self._items:
-            widget = item.widget()
-            spaceX = self.spacing()
-            spaceY = self.spacing()
-            nextX = x + item.sizeHint().width() + spaceX
-            if nextX - spaceX > rect.right() and lineHeight > 0:
-                x = rect.x()
-                y = y + lineHeight + spaceY
-                nextX = x + item.sizeHint().width() + spaceX
-                lineHeight = 0
-
-            if not testOnly:
-                item.setGeometry(QRect(QPoint(x, y), item.sizeHint()))
-
-            x = nextX
-            lineHeight = max(lineHeight, item.sizeHint().height())
-
-        return y + lineHeight - rect.y()
-
-
 class CircularSlider(QWidget):
     angleChanged = Signal(int)
 
@@ -468,3 +388,88 @@ class CircularSlider(QWidget):
     def setValue(self, angle):
         self._angle = angle
         self.update()
+
+
+
+class ExportOptionsDialog(QDialog):
+    def __init__(self, estimate, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export options")
+        self.estimate = estimate
+
+        # Estimating encodes sample pages, so it runs off the UI thread and only the
+        # latest choice is estimated once the running one finishes
+        self.estimate_pool = QThreadPool(self)
+        self.estimate_pool.setMaxThreadCount(1)
+        self.estimate_generation = 0
+        self.estimate_task = None
+        self.estimate_pending = False
+
+        self.profile_box = QComboBox()
+        self.profile_box.addItems(list(EXPORT_PROFILES))
+        self.profile_box.currentIndexChanged.connect(self.update_estimate)
+
+        self.page_size_box = QComboBox()
+        self.page_size_box.addItems(["Profile default", "Native"] + list(PAGE_SIZES))
+        self.page_size_box.currentIndexChanged.connect(self.update_estimate)
+
+        self.ocr_box = QCheckBox("Searchable text (OCR)")
+        self.ocr_box.toggled.connect(self.update_estimate)
+
+        self.estimate_label = QLabel("")
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QFormLayout(self)
+        layout.addRow("Profile", self.profile_box)
+        layout.addRow("Page size", self.page_size_box)
+        layout.addRow("", self.ocr_box)
+        layout.addRow("Estimate", self.estimate_label)
+        layout.addRow(buttons)
+
+        self.update_estimate()
+
+    def selected_profile(self):
+        profile = replace(EXPORT_PROFILES[self.profile_box.currentText()], ocr=self.ocr_box.isChecked())
+        page_size = self.page_size_box.currentText()
+
+        if page_size == "Native":
+            return replace(profile, page_size=None)
+        if page_size in PAGE_SIZES:
+            return replace(profile, page_size=page_size)
+        return profile
+
+    def update_estimate(self):
+        self.estimate_generation += 1
+        self.estimate_pending = True
+        self.estimate_label.setText("Estimating...")
+        self.start_estimate()
+
+    def start_estimate(self):
+        if self.estimate_task is not None or not self.estimate_pending:
+            return
+
+        self.estimate_pending = False
+        task = EstimateTask(self.estimate_generation, self.estimate, self.selected_profile())
+        task.signals.finished.connect(self.on_estimated)
+        task.setAutoDelete(False)
+        self.estimate_task = task
+        self.estimate_pool.start(task)
+
+    def on_estimated(self, generation, result):
+        self.estimate_task = None
+
+        if generation == self.estimate_generation:
+            if result is None:
+                self.estimate_label.setText("Unavailable")
+            else:
+                size, seconds = result
+                self.estimate_label.setText(f"~{size / (1024 * 1024):.1f} MB, ~{seconds:.1f} s")
+
+        self.start_estimate()
+
+    def done(self, result):
+        self.estimate_pending = False
+        super().done(result)
@@ -1,11 +1,19 @@
 import sys
-from PySide6.QtWidgets import QApplication
-from .main_window import MainWindow
 import time
 
+from .startup import enable_startup_report, report_startup
+
+
 if __name__ == "__main__":
     print(f"[APP] App launched at {time.time()}")
+    enable_startup_report()
+
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+    from .main_window import MainWindow
+
     app = QApplication(sys.argv)
     window = MainWindow()
     window.showMaximized()
-    sys.exit(app.exec())
\ No newline at end of file
+    QTimer.singleShot(0, lambda: report_startup("Window shown"))
+    sys.exit(app.exec())
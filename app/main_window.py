@@ -1,10 +1,22 @@
 from PySide6.QtWidgets import (
     QTabWidget,
     QMainWindow,
+    QWidget,
 )
 
-from .views.image_converter import ImageExportView
-from .views.doc_qa import DocumentQAView
+from .startup import report_startup
+
+
+def build_image_export_view():
+    from .views.image_converter import ImageExportView
+
+    return ImageExportView()
+
+
+def build_qa_view():
+    from .views.doc_qa import DocumentQAView
+
+    return DocumentQAView()
 
 
 class MainWindow(QMainWindow):
@@ -15,11 +27,34 @@ class MainWindow(QMainWindow):
         self.tabs = QTabWidget()
         self.setCentralWidget(self.tabs)
 
+        self.tab_builders = {}
         self.init_tabs()
 
+        self.tabs.currentChanged.connect(self.build_tab)
+        self.build_tab(self.tabs.currentIndex())
+
     def init_tabs(self):
-        image_export_tab = ImageExportView()
-        self.tabs.addTab(image_export_tab, "Image export")
+        self.add_lazy_tab(build_image_export_view, "Image export")
+        self.add_lazy_tab(build_qa_view, "QA with LLM")
+
+    def add_lazy_tab(self, builder, title):
+        index = self.tabs.addTab(QWidget(), title)
+        self.tab_builders[index] = builder
+
+    def build_tab(self, index):
+        builder = self.tab_builders.pop(index, None)
+        if builder is None:
+            return
+
+        title = self.tabs.tabText(index)
+        view = builder()
+
+        placeholder = self.tabs.widget(index)
+        self.tabs.blockSignals(True)
+        self.tabs.removeTab(index)
+        self.tabs.insertTab(index, view, title)
+        self.tabs.setCurrentIndex(index)
+        self.tabs.blockSignals(False)
+        placeholder.deleteLater()
 
-        qa_tab = DocumentQAView()
-        self.tabs.addTab(qa_tab, "QA with LLM")
\ No newline at end of file
+        report_startup(f"{title} tab built")
@@ -0,0 +1,300 @@
+import json
+import tempfile
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+import markdown
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QPoint, QRectF, QSize
+from PySide6.QtGui import QColor, QKeySequence, QPainter, QTextDocument
+from PySide6.QtWidgets import QAbstractItemView, QApplication, QListView, QStyledItemDelegate
+
+from app.cache import cache_dir
+
+
+MAX_LOADED = 200
+PAGE_SIZE = 50
+MAX_DOCUMENTS = 100
+BUBBLE_WIDTH = 0.75
+BUBBLE_PADDING = 10
+BUBBLE_MARGIN = 6
+MESSAGE_ROLE = Qt.UserRole + 1
+
+
+@dataclass
+class ChatMessage:
+    id: int
+    sender: str
+    text: str
+    html: str
+
+
+def message_html(text, sender):
+    name = "You" if sender == "user" else "Assistant"
+    html_body = markdown.markdown(text, extensions=["extra", "sane_lists"])
+    return f"<b>{name}:</b> {html_body}"
+
+
+class TranscriptArchive:
+    # Every message is written here as it arrives, so the model only has to keep a
+    # window of the conversation in memory and can read the rest back on demand
+    def __init__(self):
+        self.file = tempfile.TemporaryFile(dir=cache_dir("chat"))
+        self.offsets = []
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def append(self, message):
+        self.file.seek(0, 2)
+        self.offsets.append(self.file.tell())
+        self.file.write(json.dumps(asdict(message)).encode("utf-8") + b"\n")
+
+    def read(self, start, end):
+        if start >= end:
+            return []
+
+        self.file.seek(self.offsets[start])
+        return [ChatMessage(**json.loads(self.file.readline())) for _ in range(end - start)]
+
+    def close(self):
+        self.file.close()
+
+
+class ChatModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.archive = TranscriptArchive()
+        self.messages = []
+        self.window_start = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        message = self.messages[index.row()]
+
+        if role == MESSAGE_ROLE:
+            return message
+        if role == Qt.DisplayRole:
+            return message.text
+
+        return None
+
+    def window_end(self):
+        return self.window_start + len(self.messages)
+
+    def has_earlier(self):
+        return self.window_start > 0
+
+    def has_later(self):
+        return self.window_end() < len(self.archive)
+
+    def append(self, text, sender):
+        message = ChatMessage(len(self.archive), sender, text, message_html(text, sender))
+
+        if self.has_later():
+            self.jump_to_end()
+
+        self.archive.append(message)
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.messages.append(message)
+        self.endInsertRows()
+
+        if len(self.messages) > MAX_LOADED:
+            self.drop_front(PAGE_SIZE)
+
+        return message
+
+    def jump_to_end(self):
+        self.beginResetModel()
+        self.window_start = max(0, len(self.archive) - MAX_LOADED + PAGE_SIZE)
+        self.messages = self.archive.read(self.window_start, len(self.archive))
+        self.endResetModel()
+
+    def drop_front(self, count):
+        self.beginRemoveRows(QModelIndex(), 0, count - 1)
+        del self.messages[:count]
+        self.window_start += count
+        self.endRemoveRows()
+
+    def drop_back(self, count):
+        row = len(self.messages) - count
+        self.beginRemoveRows(QModelIndex(), row, len(self.messages) - 1)
+        del self.messages[row:]
+        self.endRemoveRows()
+
+    def load_earlier(self):
+        count = min(PAGE_SIZE, self.window_start)
+        if not count:
+            return 0
+
+        earlier = self.archive.read(self.window_start - count, self.window_start)
+        self.beginInsertRows(QModelIndex(), 0, count - 1)
+        self.messages[:0] = earlier
+        self.window_start -= count
+        self.endInsertRows()
+
+        if len(self.messages) > MAX_LOADED:
+            self.drop_back(len(self.messages) - MAX_LOADED)
+        return count
+
+    def load_later(self):
+        count = min(PAGE_SIZE, len(self.archive) - self.window_end())
+        if not count:
+            return 0
+
+        later = self.archive.read(self.window_end(), self.window_end() + count)
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row + count - 1)
+        self.messages.extend(later)
+        self.endInsertRows()
+
+        if len(self.messages) > MAX_LOADED:
+            self.drop_front(len(self.messages) - MAX_LOADED)
+        return count
+
+    def clear(self):
+        self.beginResetModel()
+        self.archive.close()
+        self.archive = TranscriptArchive()
+        self.messages = []
+        self.window_start = 0
+        self.endResetModel()
+
+
+class ChatDelegate(QStyledItemDelegate):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.width = 0
+        self.heights = {}
+        self.documents = OrderedDict()
+
+    def bubble_width(self):
+        return max(120, round(self.width * BUBBLE_WIDTH))
+
+    def set_width(self, width):
+        # Heights and layouts are only valid for one viewport width
+        if width != self.width:
+            self.width = width
+            self.heights.clear()
+            self.documents.clear()
+
+    def document(self, message):
+        document = self.documents.get(message.id)
+        if document is not None:
+            self.documents.move_to_end(message.id)
+            return document
+
+        document = QTextDocument()
+        document.setDocumentMargin(0)
+        document.setDefaultStyleSheet("body { color: #000; }")
+        document.setHtml(message.html)
+        document.setTextWidth(self.bubble_width() - 2 * BUBBLE_PADDING)
+        document.setTextWidth(min(document.idealWidth(), document.textWidth()))
+
+        self.documents[message.id] = document
+        while len(self.documents) > MAX_DOCUMENTS:
+            self.documents.popitem(last=False)
+
+        return document
+
+    def sizeHint(self, option, index):
+        message = index.data(MESSAGE_ROLE)
+        height = self.heights.get(message.id)
+        if height is None:
+            height = round(self.document(message).size().height()) + 2 * (BUBBLE_PADDING + BUBBLE_MARGIN)
+            self.heights[message.id] = height
+
+        return QSize(self.width, height)
+
+    def paint(self, painter, option, index):
+        message = index.data(MESSAGE_ROLE)
+        document = self.document(message)
+
+        width = document.size().width() + 2 * BUBBLE_PADDING
+        height = document.size().height() + 2 * BUBBLE_PADDING
+        if message.sender == "user":
+            left = option.rect.right() - BUBBLE_MARGIN - width
+        else:
+            left = option.rect.left() + BUBBLE_MARGIN
+        bubble = QRectF(left, option.rect.top() + BUBBLE_MARGIN, width, height)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor("#d0e7ff") if message.sender == "user" else QColor("#d0ffd6"))
+        painter.drawRoundedRect(bubble, 10, 10)
+
+        painter.translate(bubble.left() + BUBBLE_PADDING, bubble.top() + BUBBLE_PADDING)
+        document.drawContents(painter)
+        painter.restore()
+
+
+class ChatTranscriptView(QListView):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.paging = False
+
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setResizeMode(QListView.Adjust)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setFocusPolicy(Qt.ClickFocus)
+
+        self.chat_model = ChatModel(parent=self)
+        self.chat_delegate = ChatDelegate(self)
+        self.setModel(self.chat_model)
+        self.setItemDelegate(self.chat_delegate)
+
+        self.verticalScrollBar().valueChanged.connect(self.on_scrolled)
+
+    def append_message(self, text, sender):
+        self.chat_model.append(text, sender)
+        self.scrollToBottom()
+
+    def resizeEvent(self, event):
+        self.chat_delegate.set_width(self.viewport().width())
+        super().resizeEvent(event)
+
+    def on_scrolled(self, value):
+        if self.paging:
+            return
+
+        scrollbar = self.verticalScrollBar()
+        if value == scrollbar.minimum() and self.chat_model.has_earlier():
+            self.page(self.chat_model.load_earlier)
+        elif value == scrollbar.maximum() and self.chat_model.has_later():
+            self.page(self.chat_model.load_later)
+
+    def page(self, load):
+        # Rows come and go at both ends of the window, so the message at the top of
+        # the viewport is used as an anchor to keep the content from jumping
+        anchor = self.indexAt(QPoint(0, 0))
+        anchor_id = anchor.data(MESSAGE_ROLE).id if anchor.isValid() else None
+        anchor_top = self.visualRect(anchor).top() if anchor.isValid() else 0
+
+        self.paging = True
+        try:
+            load()
+            self.executeDelayedItemsLayout()
+
+            if anchor_id is not None:
+                row = anchor_id - self.chat_model.window_start
+                if 0 <= row < self.chat_model.rowCount():
+                    top = self.visualRect(self.chat_model.index(row)).top()
+                    scrollbar = self.verticalScrollBar()
+                    scrollbar.setValue(scrollbar.value() + top - anchor_top)
+        finally:
+            self.paging = False
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            rows = sorted(index.row() for index in self.selectedIndexes())
+            QApplication.clipboard().setText("\n\n".join(self.chat_model.messages[row].text for row in rows))
+            return
+
+        super().keyPressEvent(event)
@@ -0,0 +1,120 @@
+def chunk_pages(sentences):
+    pages = set()
+
+    for sentence in sentences:
+        pages.add(sentence["page_number"])
+        pages.update(duplicate["page_number"] for duplicate in sentence.get("duplicates", []))
+
+    return sorted(pages)
+
+
+class TokenChunker:
+    def __init__(self, tokenizer, target_tokens: int = 384, max_tokens: int = 512, overlap_tokens: int = 0):
+        self.tokenizer = tokenizer
+        self.target_tokens = target_tokens
+        self.max_tokens = max_tokens - tokenizer.num_special_tokens_to_add()
+        self.overlap_tokens = overlap_tokens
+
+    def count_tokens(self, sentences):
+        if not sentences:
+            return []
+
+        encoded = self.tokenizer(sentences, add_special_tokens=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def split_long_sentence(self, sentence, first_tokens):
+        text = sentence["text"]
+        offsets = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True
+        )["offset_mapping"]
+
+        starts = [0] + list(range(first_tokens, len(offsets), self.max_tokens))
+        pieces = []
+        for start, stop in zip(starts, starts[1:] + [len(offsets)]):
+            window = offsets[start: stop]
+            end = offsets[stop][0] if stop < len(offsets) else len(text)
+            pieces.append({**sentence, "text": text[window[0][0]: end].strip(), "tokens": len(window)})
+
+        return pieces
+
+    def is_contiguous(self, previous, sentence):
+        if sentence["page_number"] == previous["page_number"]:
+            return sentence["index"] >= previous["index"]
+        return sentence["page_number"] == previous["page_number"] + 1
+
+    def split_runs(self, sentences):
+        runs = []
+
+        for sentence in sentences:
+            if runs and self.is_contiguous(runs[-1][-1], sentence):
+                runs[-1].append(sentence)
+            else:
+                runs.append([sentence])
+
+        return runs
+
+    def pack_run(self, sentences):
+        chunks = []
+        current, current_tokens, overlap = [], 0, 0
+
+        def flush():
+            nonlocal current, current_tokens, overlap
+            chunks.append({"sentences": current, "token_count": current_tokens, "overlap": overlap})
+
+            carried, carried_tokens = [], 0
+            for sentence in reversed(current):
+                if carried_tokens + sentence["tokens"] > self.overlap_tokens:
+                    break
+                carried.insert(0, sentence)
+                carried_tokens += sentence["tokens"]
+
+            current, current_tokens, overlap = carried, carried_tokens, len(carried)
+
+        for sentence in sentences:
+            # A sentence longer than the window is split with its first piece sized to
+            # what the buffer leaves free, so the sentences before it fill out that
+            # chunk instead of being flushed as a tiny one of their own
+            pieces = [sentence]
+            if sentence["tokens"] > self.max_tokens:
+                pieces = self.split_long_sentence(sentence, self.max_tokens - current_tokens)
+
+            for piece in pieces:
+                if len(current) > overlap and current_tokens + piece["tokens"] > self.max_tokens:
+                    flush()
+                while current and current_tokens + piece["tokens"] > self.max_tokens:
+                    current_tokens -= current.pop(0)["tokens"]
+                    overlap -= 1
+
+                current.append(piece)
+                current_tokens += piece["tokens"]
+
+                if current_tokens >= self.target_tokens:
+                    flush()
+
+        if len(current) > overlap:
+            tail = current[overlap:]
+            tail_tokens = sum(sentence["tokens"] for sentence in tail)
+
+            if chunks and chunks[-1]["token_count"] + tail_tokens <= self.max_tokens:
+                chunks[-1]["sentences"].extend(tail)
+                chunks[-1]["token_count"] += tail_tokens
+            else:
+                chunks.append({"sentences": current, "token_count": current_tokens, "overlap": overlap})
+
+        return chunks
+
+    def chunk(self, sentences):
+        sentences = sorted(sentences, key=lambda sentence: (sentence["page_number"], sentence["index"]))
+
+        for sentence, tokens in zip(sentences, self.count_tokens([sentence["text"] for sentence in sentences])):
+            sentence["tokens"] = tokens
+
+        chunks = []
+        for run in self.split_runs(sentences):
+            chunks.extend(self.pack_run(run))
+
+        for chunk in chunks:
+            chunk["pages"] = chunk_pages(chunk["sentences"])
+            del chunk["overlap"]
+
+        return chunks
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import statistics
+from dataclasses import dataclass, field
+
+from .prompt_type import Prompt, PromptType
+
+
+MAX_HISTORY_CHARS = 24000
+KEEP_TURNS = 2
+
+
+def chunk_key(chunk):
+    return hashlib.sha1(chunk.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Completion:
+    text: str
+    ttft: float | None = None
+    prompt_tokens: int | None = None
+    cached_tokens: int | None = None
+    failed: bool = False
+
+
+@dataclass
+class Turn:
+    prompt: Prompt
+    chunk_keys: list[str] = field(default_factory=list)
+    answer: str = ""
+    completion: Completion | None = None
+
+
+class Conversation:
+    # Requests are built append-only: the system message never changes and earlier
+    # turns are sent back byte for byte, so a backend can reuse everything it has
+    # already processed and only evaluate the newest turn
+    def __init__(self, document_path="", prompt_type=PromptType.TEXT):
+        self.document_path = document_path
+        self.prompt_type = prompt_type
+        self.turns = []
+        self.session = None
+
+    def system_message(self):
+        system = Prompt("", "", self.prompt_type).system_prompt()
+        if self.document_path:
+            system += f"\n\nThe questions are about the document \"{os.path.basename(self.document_path)}\"."
+        return system
+
+    def ask(self, question, chunks):
+        self.trim()
+
+        # Chunks already sent in an earlier turn are still in the history, so only
+        # new ones are added and the earlier turns stay untouched
+        seen = {key for turn in self.turns for key in turn.chunk_keys}
+        new_chunks = {}
+        for chunk in chunks:
+            key = chunk_key(chunk)
+            if key not in seen:
+                new_chunks.setdefault(key, chunk)
+
+        prompt = Prompt("\n\n".join(new_chunks.values()), question, self.prompt_type)
+        self.turns.append(Turn(prompt, list(new_chunks)))
+        return prompt
+
+    def messages(self):
+        messages = [{"role": "system", "content": self.system_message()}]
+
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn.prompt.format_prompt()})
+            if turn.answer:
+                messages.append({"role": "assistant", "content": turn.answer})
+
+        return messages
+
+    def transcript(self):
+        # Used to start a new local session; everything but the newest question is
+        # replayed as plain text
+        parts = [f"{turn.prompt.format_prompt()}\n\nAnswer:\n{turn.answer}" for turn in self.turns[:-1]]
+        parts.append(self.turns[-1].prompt.format_prompt())
+        return "\n\n".join(parts)
+
+    def history_chars(self):
+        return sum(len(turn.prompt.format_prompt()) + len(turn.answer) for turn in self.turns)
+
+    def trim(self):
+        # History is cut back in one large step rather than a turn at a time, so the
+        # cached prefix is invalidated once instead of on every question
+        if self.history_chars() <= MAX_HISTORY_CHARS or len(self.turns) <= KEEP_TURNS:
+            return
+
+        dropped = len(self.turns) - KEEP_TURNS
+        del self.turns[:dropped]
+        self.session = None
+        print(f"[LLM] Dropped the {dropped} oldest turn(s) from the conversation history")
+
+    def discard(self):
+        if self.turns and self.turns[-1].completion is None:
+            self.turns.pop()
+
+    def record(self, completion):
+        turn = self.turns[-1]
+        turn.answer = completion.text
+        turn.completion = completion
+        print(f"[LLM] {self.timing_summary()}")
+
+    def timing_summary(self):
+        timed = [(number, turn.completion) for number, turn in enumerate(self.turns, 1)
+                 if turn.completion is not None and turn.completion.ttft is not None]
+        if not timed:
+            return f"Turn {len(self.turns)}: no first-token time measured"
+
+        number, latest = timed[-1]
+        summary = f"Turn {number}: first token after {latest.ttft:.2f}s"
+        if latest.prompt_tokens is not None:
+            summary += f", {latest.prompt_tokens} prompt token(s) evaluated"
+        if latest.cached_tokens:
+            summary += f" ({latest.cached_tokens} cached)"
+
+        first = timed[0][1].ttft
+        follow_ups = [completion.ttft for _, completion in timed[1:]]
+        if follow_ups:
+            summary += f"; first turn {first:.2f}s, follow-ups {statistics.mean(follow_ups):.2f}s mean"
+        return summary
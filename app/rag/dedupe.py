@@ -0,0 +1,119 @@
+import re
+import zlib
+
+import numpy as np
+
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def position(reference):
+    return reference["page_hash"], reference["occurrence"], reference["index"]
+
+
+class NearDuplicateFilter:
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, shingle_size: int = 3):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(1)
+        self.a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self.buckets = {}
+        self.signatures = []
+        self.numbers = []
+        self.owners = []
+
+    def normalise(self, text):
+        return re.sub(r"\d+", "0", text.lower()).split()
+
+    def numbers_in(self, text):
+        return tuple(_NUMBER.findall(text))
+
+    def shingles(self, text):
+        words = self.normalise(text)
+        size = min(self.shingle_size, len(words))
+        return {" ".join(words[i: i + size]) for i in range(len(words) - size + 1)}
+
+    def signature(self, text):
+        hashes = np.array(
+            [zlib.crc32(shingle.encode("utf-8")) for shingle in self.shingles(text)] or [0],
+            dtype=np.uint64,
+        )
+        permuted = (hashes[:, None] * self.a + self.b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def band_keys(self, signature):
+        return [(band, signature[band * self.rows: (band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def find(self, signature, numbers):
+        candidates = set()
+        for key in self.band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+
+        # Digits are normalised in the shingles so page and line numbers don't hide
+        # a repeated footer, but figures that differ are different facts
+        for candidate in sorted(candidates):
+            if self.numbers[candidate] != numbers:
+                continue
+            if np.mean(self.signatures[candidate] == signature) >= self.threshold:
+                return self.owners[candidate]
+
+        return None
+
+    def add(self, signature, numbers, owner):
+        slot = len(self.signatures)
+        self.signatures.append(signature)
+        self.numbers.append(numbers)
+        self.owners.append(owner)
+
+        for key in self.band_keys(signature):
+            self.buckets.setdefault(key, []).append(slot)
+
+    def seed(self, sentences):
+        for sentence in sentences:
+            self.add(self.signature(sentence["text"]), self.numbers_in(sentence["text"]), sentence)
+
+    def record_duplicate(self, original, reference):
+        recorded = {position(original)} | {position(duplicate) for duplicate in original["duplicates"]}
+        if position(reference) not in recorded:
+            original["duplicates"].append(reference)
+
+    def filter(self, sentences):
+        kept = []
+        skipped_chars = 0
+
+        for sentence in sentences:
+            signature = self.signature(sentence["text"])
+            numbers = self.numbers_in(sentence["text"])
+            original = self.find(signature, numbers)
+
+            if original is None:
+                sentence.setdefault("duplicates", [])
+                self.add(signature, numbers, sentence)
+                kept.append(sentence)
+                continue
+
+            original.setdefault("duplicates", [])
+            self.record_duplicate(original, {
+                "page_number": sentence["page_number"],
+                "page_hash": sentence["page_hash"],
+                "occurrence": sentence["occurrence"],
+                "index": sentence["index"],
+            })
+            for duplicate in sentence.get("duplicates", []):
+                self.record_duplicate(original, duplicate)
+            skipped_chars += len(sentence["text"])
+
+        stats = {
+            "sentences": len(sentences),
+            "skipped_sentences": len(sentences) - len(kept),
+            "skipped_chars": skipped_chars,
+        }
+
+        return kept, stats
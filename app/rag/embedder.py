@@ -4,11 +4,27 @@ from transformers import AutoTokenizer, AutoModel
 import uuid
 import os
 
+from .resources import resource_manager
+
 
 model_name_or_path = 'Alibaba-NLP/gte-multilingual-base'
 tokenizer = AutoTokenizer.from_pretrained(model_name_or_path)
-model = AutoModel.from_pretrained(model_name_or_path, trust_remote_code=True)
-model.eval()
+
+
+def load_model():
+    model = AutoModel.from_pretrained(model_name_or_path, trust_remote_code=True)
+    model.eval()
+    return model
+
+
+def model_bytes(model):
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+# The tokenizer is small and the chunker needs it, so only the model weights are
+# loaded on first use and can be unloaded again while the app is idle
+embedding_model = resource_manager.register("embedding model", load_model, model_bytes)
 
 
 def generate_embeddings(texts: list[str] | str) -> torch.Tensor:
@@ -20,7 +36,7 @@ def generate_embeddings(texts: list[str] | str) -> torch.Tensor:
         return_tensors='pt'
     )
 
-    with torch.no_grad():
+    with embedding_model.use() as model, torch.no_grad():
         outputs = model(**inputs)
         embeddings = outputs.last_hidden_state[:, 0]
         embeddings = F.normalize(embeddings, p=2, dim=1)
@@ -28,48 +44,55 @@ def generate_embeddings(texts: list[str] | str) -> torch.Tensor:
     return embeddings
 
 
-def embedd_chunks(processed_chunks):
-    for item in processed_chunks:
-        embeddings = []
-
-        for chunk in item["chunks"]:
-            joined_sentences = " ".join(chunk)
+def embedd_chunks(processed_chunks, batch_size: int = 16):
+    order = sorted(range(len(processed_chunks)), key=lambda i: processed_chunks[i]["token_count"])
 
-            emb = generate_embeddings(joined_sentences)
+    for start in range(0, len(order), batch_size):
+        batch = [processed_chunks[i] for i in order[start: start + batch_size]]
+        texts = [" ".join(sentence["text"] for sentence in chunk["sentences"]) for chunk in batch]
 
-            emb_np = emb[0].cpu().numpy()
-            embeddings.append(emb_np)
+        embeddings = generate_embeddings(texts).cpu().numpy()
 
-        item["embeddings"] = embeddings
+        for chunk, text, emb_np in zip(batch, texts, embeddings):
+            chunk["text"] = text
+            chunk["embedding"] = emb_np
     
     return processed_chunks
 
 
-def generate_chunk_entries(processed_contents):
+def generate_chunk_entries(processed_chunks):
     chunk_entries = []
 
-    for item in processed_contents:
-        page_num = item["page_number"]
-
-        for idx, chunk in enumerate(item["chunks"]):
-            chunk_dict = {}
-            chunk_text = " ".join(chunk)
-            token_count = len(chunk_text)/4
-
-            chunk_dict["chunk_id"] = str(uuid.uuid4())
-            chunk_dict["page_num"] = int(page_num)
-            chunk_dict["text"] = chunk_text
-            chunk_dict["embedding"] = item["embeddings"][idx]
-
-            metadata = {
-                "char_count": len(chunk_text),
-                "sentence_count": len(chunk),
-                "token_count": token_count,
+    for chunk in processed_chunks:
+        chunk_dict = {}
+        chunk_text = chunk["text"]
+
+        chunk_dict["chunk_id"] = str(uuid.uuid4())
+        chunk_dict["page_num"] = int(chunk["sentences"][0]["page_number"])
+        chunk_dict["pages"] = [int(page) for page in chunk["pages"]]
+        chunk_dict["text"] = chunk_text
+        chunk_dict["embedding"] = chunk["embedding"]
+        chunk_dict["sentences"] = [
+            {
+                "page_number": s["page_number"],
+                "page_hash": s["page_hash"],
+                "occurrence": s["occurrence"],
+                "index": s["index"],
+                "text": s["text"],
+                "duplicates": s.get("duplicates", []),
             }
+            for s in chunk["sentences"]
+        ]
+
+        metadata = {
+            "char_count": len(chunk_text),
+            "sentence_count": len(chunk["sentences"]),
+            "token_count": chunk["token_count"],
+        }
 
-            chunk_dict["metadata"] = metadata
+        chunk_dict["metadata"] = metadata
 
-            chunk_entries.append(chunk_dict)
+        chunk_entries.append(chunk_dict)
 
     return chunk_entries
 
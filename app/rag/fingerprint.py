@@ -0,0 +1,11 @@
+from app.cache import hash_parts
+
+
+def page_fingerprint(page) -> str:
+    doc = page.parent
+    parts = [f"{tuple(page.rect)}|{page.rotation}", page.read_contents()]
+
+    for image in page.get_images(full=True):
+        parts.append(doc.xref_stream_raw(image[0]) or b"")
+
+    return hash_parts(*parts)
@@ -0,0 +1,119 @@
+import os
+import pickle
+from collections import Counter
+
+from app.cache import cache_dir, hash_parts
+from .chunker import chunk_pages
+
+
+INDEX_FORMAT_VERSION = 5
+
+
+class IndexStore:
+    def __init__(self, doc_path, model_name):
+        self.doc_path = os.path.abspath(doc_path)
+        self.model_name = model_name
+        self.path = cache_dir("index") / f"{hash_parts(self.doc_path)}.pkl"
+
+    def load(self):
+        if not self.path.exists():
+            return [], [], {}
+
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return [], [], {}
+
+        if state.get("version") != INDEX_FORMAT_VERSION or state.get("model") != self.model_name:
+            return [], [], {}
+
+        return state["page_hashes"], state["chunk_entries"], state["search_pages"]
+
+    def save(self, page_hashes, chunk_entries, search_pages):
+        state = {
+            "version": INDEX_FORMAT_VERSION,
+            "model": self.model_name,
+            "page_hashes": page_hashes,
+            "chunk_entries": chunk_entries,
+            "search_pages": search_pages,
+        }
+
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+
+def page_positions(page_hashes):
+    # Identical pages share a fingerprint, so a page is identified by its hash and
+    # by which copy of that hash it is in document order
+    positions = {}
+    for page_no, page_hash in enumerate(page_hashes):
+        positions.setdefault(page_hash, []).append(page_no)
+
+    return positions
+
+
+def is_clean(reference, clean_pages):
+    return reference["occurrence"] < len(clean_pages.get(reference["page_hash"], ()))
+
+
+def remap_reference(reference, clean_pages):
+    return {**reference, "page_number": clean_pages[reference["page_hash"]][reference["occurrence"]]}
+
+
+def remap_sentence(sentence, clean_pages):
+    sentence.update(remap_reference(sentence, clean_pages))
+    sentence["duplicates"] = [
+        remap_reference(duplicate, clean_pages)
+        for duplicate in sentence.get("duplicates", [])
+        if is_clean(duplicate, clean_pages)
+    ]
+
+    return sentence
+
+
+def refresh_entry_pages(entry):
+    entry["pages"] = chunk_pages(entry["sentences"])
+    entry["page_num"] = entry["sentences"][0]["page_number"]
+
+
+def plan_reindex(known_hashes, previous_entries, page_hashes):
+    known_counts = Counter(known_hashes)
+    clean_pages = {}
+    dirty_pages = []
+
+    for page_hash, pages in page_positions(page_hashes).items():
+        if known_counts[page_hash]:
+            clean_pages[page_hash] = pages[:known_counts[page_hash]]
+        dirty_pages.extend(pages[known_counts[page_hash]:])
+
+    dirty_pages.sort()
+
+    reused_entries = []
+    stale_entries = []
+    carried_sentences = {}
+
+    for entry in previous_entries:
+        if all(is_clean(sentence, clean_pages) for sentence in entry["sentences"]):
+            for sentence in entry["sentences"]:
+                remap_sentence(sentence, clean_pages)
+            refresh_entry_pages(entry)
+            reused_entries.append(entry)
+            continue
+
+        stale_entries.append(entry)
+        for sentence in entry["sentences"]:
+            sentence = dict(sentence)
+
+            if not is_clean(sentence, clean_pages):
+                duplicates = [d for d in sentence.get("duplicates", []) if is_clean(d, clean_pages)]
+                if not duplicates:
+                    continue
+                sentence = {**sentence, **duplicates[0], "duplicates": duplicates[1:]}
+
+            key = (sentence["page_hash"], sentence["occurrence"], sentence["index"], sentence["text"])
+            carried_sentences[key] = remap_sentence(sentence, clean_pages)
+
+    return reused_entries, stale_entries, dirty_pages, list(carried_sentences.values())
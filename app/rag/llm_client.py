@@ -1,60 +1,110 @@
-import subprocess
+import json
 import os
+import time
+import urllib.error
+import urllib.request
 
 from openai import OpenAI
-from .prompt_type import Prompt
+from .conversation import Completion
 from dotenv import load_dotenv
 from pathlib import Path
 
 load_dotenv(dotenv_path=Path(__file__).parent.parent / ".env")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+OLLAMA_NUM_CTX = 8192
+# Applies to connecting and to each read, so a long answer is fine as long as tokens
+# keep arriving; it mainly has to cover evaluating a fresh prompt on a CPU
+OLLAMA_TIMEOUT_S = float(os.getenv("DOCUWIZARD_OLLAMA_TIMEOUT_S", "120"))
+SESSION_TOKENS = 6144
+OPENROUTER_MODEL = "deepseek/deepseek-chat-v3-0324:free"
+
+
+def query_local_llm(conversation, model="mistral", num_predict=None):
+    # Ollama hands back the evaluated tokens as `context`; passing them with the
+    # next question keeps its KV cache, so a follow-up only evaluates the new turn
+    if conversation.session is None:
+        body = {"system": conversation.system_message(), "prompt": conversation.transcript()}
+    else:
+        body = {"context": conversation.session, "prompt": conversation.turns[-1].prompt.format_prompt()}
+
+    options = {"num_ctx": OLLAMA_NUM_CTX}
+    if num_predict is not None:
+        options["num_predict"] = num_predict
+    body.update(model=model, stream=True, keep_alive="30m", options=options)
+
+    request = urllib.request.Request(
+        f"{OLLAMA_HOST}/api/generate", data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"}
+    )
+
+    started = time.perf_counter()
+    ttft = None
+    parts = []
+    final = {}
 
-def query_local_llm(prompt, model="mistral"):
     try:
-        result = subprocess.run(
-            ["ollama", "run", model],
-            input=prompt.encode('utf-8'),
-            capture_output=True,
-            check=True
-        )
+        with urllib.request.urlopen(request, timeout=OLLAMA_TIMEOUT_S) as response:
+            for line in response:
+                data = json.loads(line)
+                if data.get("error"):
+                    return Completion(f"Local LLM error: {data['error']}", failed=True)
+
+                if data.get("response"):
+                    if ttft is None:
+                        ttft = time.perf_counter() - started
+                    parts.append(data["response"])
+
+                if data.get("done"):
+                    final = data
 
-        return result.stdout.decode('utf-8')
-    
-    except subprocess.CalledProcessError as e:
-        return f"Local LLM error: {e.stderr.decode('utf-8')}"
-    
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        conversation.session = None
+        return Completion(f"Local LLM error: {e}", failed=True)
 
+    # A session close to the context window would be shifted by Ollama, which
+    # silently drops its beginning; starting over keeps the prompt intact
+    context = final.get("context")
+    conversation.session = context if context and len(context) < SESSION_TOKENS else None
+
+    return Completion("".join(parts), ttft, final.get("prompt_eval_count"))
+
+
+def query_via_openrouter(conversation, model=OPENROUTER_MODEL):
+    # The local session would not contain this turn, and its chunks are never sent
+    # again, so the next local question starts over from the full transcript
+    conversation.session = None
 
-def query_via_openrouter(prompt: Prompt):
     client = OpenAI(
     base_url="https://openrouter.ai/api/v1",
     api_key=OPENAI_API_KEY,
     )
 
-    content = f"""
-    Context:
-    {prompt.context}
-
-    Question:
-    {prompt.question}
+    started = time.perf_counter()
+    ttft = None
+    parts = []
+    usage = None
 
-    Answer:
-    """
-
-    completion = client.chat.completions.create(
+    stream = client.chat.completions.create(
     extra_headers={},
     extra_body={},
-    model="deepseek/deepseek-chat-v3-0324:free",
-    messages=[
-        {
-            "role": "system",
-            "content": "You are a question-answering assistant"
-        },
-        {
-            "role": "user",
-            "content": content
-        }
-    ]
+    model=model,
+    messages=conversation.messages(),
+    stream=True,
+    stream_options={"include_usage": True},
     )
 
-    return completion.choices[0].message.content
\ No newline at end of file
+    for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage
+
+        if chunk.choices and chunk.choices[0].delta.content:
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            parts.append(chunk.choices[0].delta.content)
+
+    prompt_tokens = usage.prompt_tokens if usage is not None else None
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None)
+
+    return Completion("".join(parts), ttft, prompt_tokens, cached_tokens)
@@ -1,50 +1,140 @@
-from .llm_client import query_local_llm, query_via_openrouter
-from .prompt_type import Prompt
-from .preprocessor import preprocess_pipeline
-from .embedder import embedding_pipeline, generate_embeddings
+import threading
+
+from .llm_client import OPENROUTER_MODEL, query_local_llm, query_via_openrouter
+from .conversation import Conversation
+from .preprocessor import DocPreprocessor, preprocess_pipeline
+from .embedder import embedding_pipeline, generate_embeddings, model_name_or_path, tokenizer
+from .index_store import IndexStore, plan_reindex, refresh_entry_pages
 from .vector_store import ContentStore
-import torch
+from .search_index import TextSearchIndex
+from .resources import resource_manager
 
 
 content_store = None
+content_store_path = None
+indexed_page_hashes = []
+search_index = None
+conversation = None
+
+# Speculative retrieval queries the store from a worker thread while typing, so
+# swaps and updates of the store happen under this lock and bump the version
+retrieval_lock = threading.Lock()
+store_version = 0
 
 
-def prepare_doc_retrieval(doc_path):
+def prepare_doc_retrieval(doc_path, doc=None, doc_lock=None):
     if (doc_path == ""):
-        return
+        return None
     
-    global content_store
+    global content_store, content_store_path, indexed_page_hashes, search_index, store_version
     
     print(f"[RAG] Starting document retrieval for: {doc_path}")
-    processed_chunks = preprocess_pipeline(doc_path)
-    chunk_entries = embedding_pipeline(processed_chunks)
+    preprocessor = DocPreprocessor(doc_path, tokenizer, doc=doc, doc_lock=doc_lock)
+    page_hashes = preprocessor.page_hashes()
+    index_store = IndexStore(doc_path, model_name_or_path)
+
+    if content_store is not None and content_store_path == doc_path:
+        known_hashes, previous_entries = indexed_page_hashes, content_store.chunk_entries
+        previous_search_pages = search_index.pages
+    else:
+        known_hashes, previous_entries, previous_search_pages = index_store.load()
+        with retrieval_lock:
+            if content_store is not None:
+                content_store.close()
+            content_store = None
+            store_version += 1
+
+    reused_entries, stale_entries, dirty_pages, carried_sentences = plan_reindex(
+        known_hashes, previous_entries, page_hashes
+    )
+    print(f"[RAG] {len(page_hashes) - len(dirty_pages)} unchanged page(s), "
+          f"{len(dirty_pages)} to re-index, {len(stale_entries)} stale chunk(s)")
+
+    new_entries = []
+    if dirty_pages or carried_sentences:
+        processed_chunks = preprocess_pipeline(preprocessor, dirty_pages, carried_sentences, reused_entries)
+        new_entries = embedding_pipeline(processed_chunks)
+
+        for entry in reused_entries:
+            refresh_entry_pages(entry)
+
+    with retrieval_lock:
+        if content_store is None:
+            content_store = ContentStore(reused_entries + new_entries)
+        else:
+            content_store.update(stale_entries, new_entries)
+        store_version += 1
+
+    current_hashes = set(page_hashes)
+    search_pages = {
+        page_hash: words for page_hash, words in previous_search_pages.items() if page_hash in current_hashes
+    }
+    search_pages.update(preprocessor.search_words)
+    search_index = TextSearchIndex(page_hashes, search_pages)
+
+    content_store_path = doc_path
+    indexed_page_hashes = page_hashes
+    index_store.save(page_hashes, content_store.chunk_entries, search_pages)
+    print(f"[RAG] Content store initialized with {len(content_store.chunk_entries)} chunks")
+    resource_manager.report()
+
+    return search_index
 
-    content_store = ContentStore(chunk_entries)
-    print(f"[RAG] Content store initialized with {len(chunk_entries)} chunks")
+
+def retrieve_context(question):
+    return retrieve_versioned_context(question)[1]
+
+
+def retrieve_versioned_context(question):
+    # The version is read under the same lock as the query, so it names the store
+    # the chunks actually came from
+    if content_store is None:
+        return store_version, None
+
+    query_embedding_tensor = generate_embeddings([question])
+    query_embedding = query_embedding_tensor[0].cpu().numpy().astype("float32")
+
+    with retrieval_lock:
+        if content_store is None:
+            return store_version, None
+        return store_version, content_store.query(query_embedding)
 
 
 def query_llm(
     question,
     mode: str,
-    model=None
+    model=None,
+    context=None
 ):
-    prompt = Prompt("", question)
-    response = ""
+    global conversation
 
     if content_store is None:
         return
 
-    query = prompt.question
-    query_embedding_tensor = generate_embeddings([query])
-    query_embedding = query_embedding_tensor[0].cpu().numpy().astype("float32")
+    # Chunks retrieved speculatively while the question was typed skip the
+    # embedding and search entirely
+    retrieved_chunks = context if context is not None else retrieve_context(question)
+    if retrieved_chunks is None:
+        return
 
-    retrieved_chunks = content_store.query(query_embedding)
-    prompt.context = "\n\n".join(retrieved_chunks)
+    # Follow-up questions extend the conversation about the open document; a new
+    # document starts a new one
+    if conversation is None or conversation.document_path != content_store_path:
+        conversation = Conversation(content_store_path)
+    conversation.ask(question, retrieved_chunks)
 
-    if mode == "offline":
-        raise NotImplementedError
+    try:
+        if mode == "offline":
+            completion = query_local_llm(conversation, model or "mistral")
+        else:
+            completion = query_via_openrouter(conversation, model or OPENROUTER_MODEL)
+    except Exception:
+        conversation.discard()
+        raise
 
+    if completion.failed:
+        conversation.discard()
     else:
-        response = query_via_openrouter(prompt)
-    
-    return response
\ No newline at end of file
+        conversation.record(completion)
+
+    return completion.text
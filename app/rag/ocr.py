@@ -0,0 +1,203 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from app.cache import cache_dir, hash_parts
+
+
+OCR_ENGINE_NAME = "rapidocr"
+TEXT_LAYER_ATTACHMENT = "docuwizard-text.json"
+TEXT_LAYER_VERSION = 1
+MAX_POOL_RESTARTS = 2
+_engine = None
+
+
+def _init_worker():
+    global _engine
+    from rapidocr import RapidOCR
+
+    _engine = RapidOCR()
+
+
+def _recognise(samples: bytes, width: int, height: int, channels: int) -> str:
+    image = np.frombuffer(samples, dtype=np.uint8).reshape(height, width, channels)
+    result = _engine(image)
+
+    if not result.txts:
+        return ""
+
+    return " ".join(result.txts)
+
+
+def recognise_lines(samples: bytes, width: int, height: int, channels: int):
+    image = np.frombuffer(samples, dtype=np.uint8).reshape(height, width, channels)
+    result = _engine(image)
+
+    if not result.txts:
+        return []
+
+    lines = []
+    for box, text in zip(result.boxes, result.txts):
+        xs = [point[0] for point in box]
+        ys = [point[1] for point in box]
+        lines.append((text, (min(xs) / width, min(ys) / height, max(xs) / width, max(ys) / height)))
+
+    return lines
+
+
+def create_ocr_pool(workers: int) -> ProcessPoolExecutor:
+    # The app runs Qt and worker threads; a forked child could inherit a lock one of
+    # them held and hang, so workers are started as fresh interpreters
+    return ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def image_digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def text_layer_payload(pages) -> bytes:
+    return json.dumps(
+        {"engine": OCR_ENGINE_NAME, "version": TEXT_LAYER_VERSION, "pages": pages},
+        ensure_ascii=False
+    ).encode("utf-8")
+
+
+def load_text_layer(doc) -> dict[int, str]:
+    if TEXT_LAYER_ATTACHMENT not in doc.embfile_names():
+        return {}
+
+    try:
+        payload = json.loads(doc.embfile_get(TEXT_LAYER_ATTACHMENT))
+    except ValueError:
+        return {}
+
+    if payload.get("version") != TEXT_LAYER_VERSION:
+        return {}
+
+    # Every page carries the digest of the image it was recognised from, so pages
+    # that were edited, reordered or dropped after export fall back to extraction
+    texts = {}
+    for entry in payload.get("pages", []):
+        page_no = entry["page_number"]
+        if page_no >= len(doc):
+            continue
+
+        images = doc[page_no].get_images()
+        if images and image_digest(doc.xref_stream_raw(images[0][0])) == entry["image_sha1"]:
+            texts[page_no] = entry["text"]
+
+    return texts
+
+
+def has_text_layer(text: str, min_chars: int = 25) -> bool:
+    return sum(ch.isalnum() for ch in text) >= min_chars
+
+
+class PageOCR:
+    def __init__(self, dpi: int = 200, workers: int | None = None):
+        self.dpi = dpi
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.cache = cache_dir("ocr")
+
+    def cache_path(self, page_hash: str):
+        return self.cache / f"{hash_parts(page_hash, OCR_ENGINE_NAME, str(self.dpi))}.txt"
+
+    def run(self, doc, page_hashes: dict[int, str], doc_lock=None) -> dict[int, str]:
+        results = {}
+        pending = {}
+
+        for page_no, page_hash in page_hashes.items():
+            cached = self.cache_path(page_hash)
+            if cached.exists():
+                results[page_no] = cached.read_text(encoding="utf-8")
+            else:
+                pending[page_no] = cached
+
+        if not pending:
+            return results
+
+        print(f"[OCR] Recognising {len(pending)} page(s) at {self.dpi} DPI "
+              f"({len(results)} cached)")
+
+        # Rendered pages wait for a worker as raw pixels, so only a few are kept in
+        # flight instead of rasterising the whole document up front
+        workers = min(self.workers, len(pending))
+        window = workers * 2
+        queue = deque(pending)
+        futures = {}
+
+        # A page that fails to OCR keeps its extracted text, so one bad scan never stops
+        # the document from opening
+        failed = []
+        restarts = 0
+        pool = create_ocr_pool(workers)
+
+        def restart(lost):
+            # A worker that dies takes every page in flight with it; those are queued
+            # again on a fresh pool, a limited number of times
+            nonlocal pool, restarts
+            pool.shutdown(wait=False, cancel_futures=True)
+            lost = sorted(lost + list(futures.values()))
+            futures.clear()
+
+            if restarts < MAX_POOL_RESTARTS:
+                restarts += 1
+                print(f"[OCR] OCR workers stopped; restarting them for {len(lost)} page(s)")
+                queue.extendleft(reversed(lost))
+                pool = create_ocr_pool(workers)
+            else:
+                print(f"[OCR] OCR workers stopped again; skipping OCR for the remaining page(s)")
+                failed.extend(lost)
+                failed.extend(queue)
+                queue.clear()
+
+        def fill():
+            while queue and len(futures) < window:
+                page_no = queue.popleft()
+                try:
+                    with doc_lock or nullcontext():
+                        pix = doc[page_no].get_pixmap(dpi=self.dpi, alpha=False)
+                    futures[pool.submit(_recognise, pix.samples, pix.width, pix.height, pix.n)] = page_no
+                except BrokenProcessPool:
+                    restart([page_no])
+                except Exception as e:
+                    print(f"[OCR] Failed to render page {page_no + 1} for OCR: {e}")
+                    failed.append(page_no)
+
+        try:
+            fill()
+            while futures:
+                done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for future in done:
+                    page_no = futures.pop(future, None)
+                    if page_no is None:
+                        continue
+
+                    try:
+                        text = future.result()
+                    except BrokenProcessPool:
+                        restart([page_no])
+                        break
+                    except Exception as e:
+                        print(f"[OCR] Failed to recognise page {page_no + 1}: {e}")
+                        failed.append(page_no)
+                    else:
+                        pending[page_no].write_text(text, encoding="utf-8")
+                        results[page_no] = text
+                fill()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        if failed:
+            print(f"[OCR] Keeping the extracted text for {len(failed)} page(s) that could not be recognised")
+
+        return results
@@ -0,0 +1,313 @@
+from bisect import bisect_right
+from collections import OrderedDict
+
+import fitz
+from PySide6.QtCore import QObject, QRect, QRectF, QRunnable, QSize, QThreadPool, Qt, Signal
+from PySide6.QtGui import QColor, QImage, QPainter, QPixmap
+from PySide6.QtWidgets import QScrollArea, QWidget
+
+
+PAGE_SPACING = 12
+CACHE_BYTES = 256 * 1024 * 1024
+MIN_ZOOM = 0.25
+MAX_ZOOM = 6.0
+
+
+class PageCache:
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.pixmaps = OrderedDict()
+
+    @staticmethod
+    def cost(pixmap):
+        return pixmap.width() * pixmap.height() * 4
+
+    def get(self, key):
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(key)
+        return pixmap
+
+    def any_level(self, page_no):
+        # While a new zoom level renders, the same page at another level is scaled in
+        # its place instead of leaving a blank sheet
+        for (cached_page, _), pixmap in reversed(self.pixmaps.items()):
+            if cached_page == page_no:
+                return pixmap
+        return None
+
+    def put(self, key, pixmap):
+        previous = self.pixmaps.pop(key, None)
+        if previous is not None:
+            self.used -= self.cost(previous)
+
+        self.pixmaps[key] = pixmap
+        self.used += self.cost(pixmap)
+
+        while self.used > self.max_bytes and len(self.pixmaps) > 1:
+            _, evicted = self.pixmaps.popitem(last=False)
+            self.used -= self.cost(evicted)
+
+    def clear(self):
+        self.pixmaps.clear()
+        self.used = 0
+
+
+class PageRenderSignals(QObject):
+    rendered = Signal(int, int, float, QImage)
+
+
+class PageRenderTask(QRunnable):
+    def __init__(self, generation, doc, doc_lock, page_no, scale, signals):
+        super().__init__()
+        self.generation = generation
+        self.doc = doc
+        self.doc_lock = doc_lock
+        self.page_no = page_no
+        self.scale = scale
+        self.signals = signals
+
+    def run(self):
+        try:
+            with self.doc_lock:
+                pix = self.doc[self.page_no].get_pixmap(matrix=fitz.Matrix(self.scale, self.scale), alpha=False)
+            image = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888).copy()
+        except Exception as e:
+            print(f"[ERROR] Failed to render page {self.page_no}: {e}")
+            image = QImage()
+
+        self.signals.rendered.emit(self.generation, self.page_no, self.scale, image)
+
+
+class PageRenderer(QObject):
+    rendered = Signal(int, float, QImage)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.doc = None
+        self.doc_lock = None
+        self.generation = 0
+        self.tasks = {}
+
+        # One worker keeps MuPDF off the UI thread without fighting the indexer for
+        # the document lock
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.signals = PageRenderSignals(self)
+        self.signals.rendered.connect(self.on_rendered)
+
+    def set_document(self, doc, doc_lock):
+        # A render already running for the previous document cannot be stopped, so
+        # its result is recognised by the old generation and dropped
+        self.cancel()
+        self.generation += 1
+        self.tasks = {}
+        self.doc = doc
+        self.doc_lock = doc_lock
+
+    def request(self, page_no, scale):
+        key = (page_no, scale)
+        if self.doc is None or key in self.tasks:
+            return
+
+        task = PageRenderTask(self.generation, self.doc, self.doc_lock, page_no, scale, self.signals)
+        task.setAutoDelete(False)
+        self.tasks[key] = task
+        self.pool.start(task)
+
+    def retain(self, keys):
+        for key, task in list(self.tasks.items()):
+            if key not in keys and self.pool.tryTake(task):
+                del self.tasks[key]
+
+    def cancel(self):
+        self.retain(set())
+
+    def on_rendered(self, generation, page_no, scale, image):
+        if generation != self.generation:
+            return
+
+        self.tasks.pop((page_no, scale), None)
+        if not image.isNull():
+            self.rendered.emit(page_no, scale, image)
+
+
+class PagesWidget(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.page_sizes = []
+        self.page_tops = []
+        self.zoom = 1.0
+        self.highlights = {}
+        self.current_highlight = (None, [])
+
+        self.cache = PageCache()
+        self.renderer = PageRenderer(self)
+        self.renderer.rendered.connect(self.on_rendered)
+
+    def set_document(self, doc, doc_lock):
+        with doc_lock:
+            self.page_sizes = [(page.rect.width, page.rect.height) for page in doc]
+
+        self.cache.clear()
+        self.highlights = {}
+        self.current_highlight = (None, [])
+        self.renderer.set_document(doc, doc_lock)
+        self.relayout()
+
+    def clear(self):
+        self.page_sizes = []
+        self.cache.clear()
+        self.highlights = {}
+        self.current_highlight = (None, [])
+        self.renderer.set_document(None, None)
+        self.relayout()
+
+    def render_scale(self):
+        return round(self.zoom * self.devicePixelRatioF(), 3)
+
+    def set_zoom(self, zoom):
+        self.zoom = min(MAX_ZOOM, max(MIN_ZOOM, zoom))
+        self.relayout()
+
+    def relayout(self):
+        self.page_tops = []
+        top = PAGE_SPACING
+        width = 0
+
+        for page_width, page_height in self.page_sizes:
+            self.page_tops.append(top)
+            top += round(page_height * self.zoom) + PAGE_SPACING
+            width = max(width, round(page_width * self.zoom))
+
+        self.resize(width + 2 * PAGE_SPACING, top)
+        self.update()
+
+    def page_rect(self, page_no):
+        page_width, page_height = self.page_sizes[page_no]
+        width = round(page_width * self.zoom)
+        return QRect((self.width() - width) // 2, self.page_tops[page_no], width, round(page_height * self.zoom))
+
+    def page_at(self, y):
+        return max(0, bisect_right(self.page_tops, y) - 1)
+
+    def visible_pages(self, rect):
+        if not self.page_sizes or rect.isEmpty():
+            return range(0)
+
+        return range(self.page_at(rect.top()), self.page_at(rect.bottom()) + 1)
+
+    def set_highlights(self, highlights, current_page=None, current_rects=()):
+        self.highlights = highlights
+        self.current_highlight = (current_page, list(current_rects))
+        self.update()
+
+    def paint_highlights(self, painter, target, rects, colour):
+        for x0, y0, x1, y1 in rects:
+            painter.fillRect(
+                QRectF(
+                    target.x() + x0 * self.zoom, target.y() + y0 * self.zoom,
+                    (x1 - x0) * self.zoom, (y1 - y0) * self.zoom
+                ),
+                colour
+            )
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), QColor("#3a3a3a"))
+
+        scale = self.render_scale()
+
+        for page_no in self.visible_pages(event.rect()):
+            target = self.page_rect(page_no)
+            if not target.intersects(event.rect()):
+                continue
+
+            pixmap = self.cache.get((page_no, scale)) or self.cache.any_level(page_no)
+            if pixmap is None:
+                painter.fillRect(target, Qt.white)
+            else:
+                painter.drawPixmap(target, pixmap)
+
+            self.paint_highlights(painter, target, self.highlights.get(page_no, []), QColor(255, 210, 0, 110))
+            if self.current_highlight[0] == page_no:
+                self.paint_highlights(painter, target, self.current_highlight[1], QColor(255, 120, 0, 140))
+
+        painter.end()
+        self.request_visible()
+
+    def request_visible(self):
+        # Only pages that are on screen are rendered; anything still queued for pages
+        # that scrolled away is dropped before it reaches the worker
+        scale = self.render_scale()
+        wanted = {
+            (page_no, scale) for page_no in self.visible_pages(self.visibleRegion().boundingRect())
+            if self.cache.get((page_no, scale)) is None
+        }
+
+        self.renderer.retain(wanted)
+        for page_no, page_scale in sorted(wanted):
+            self.renderer.request(page_no, page_scale)
+
+    def on_rendered(self, page_no, scale, image):
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(self.devicePixelRatioF())
+        self.cache.put((page_no, scale), pixmap)
+
+        if scale == self.render_scale() and page_no < len(self.page_sizes):
+            self.update(self.page_rect(page_no))
+
+
+class PdfPageView(QScrollArea):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pages = PagesWidget()
+        self.fit_width = True
+
+        self.setWidget(self.pages)
+        self.setWidgetResizable(False)
+        self.setAlignment(Qt.AlignHCenter)
+
+    def set_document(self, doc, doc_lock):
+        self.fit_width = True
+        self.pages.set_document(doc, doc_lock)
+        self.apply_fit_width()
+        self.verticalScrollBar().setValue(0)
+
+    def clear(self):
+        self.pages.clear()
+
+    def apply_fit_width(self):
+        if self.fit_width and self.pages.page_sizes:
+            widest = max(width for width, _ in self.pages.page_sizes)
+            available = self.viewport().width() - 2 * PAGE_SPACING
+            self.pages.set_zoom(available / widest)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.apply_fit_width()
+
+    def wheelEvent(self, event):
+        if not event.modifiers() & Qt.ControlModifier:
+            return super().wheelEvent(event)
+
+        anchor = self.verticalScrollBar().value() / max(1, self.pages.height())
+        factor = 1.15 if event.angleDelta().y() > 0 else 1 / 1.15
+
+        self.fit_width = False
+        self.pages.set_zoom(self.pages.zoom * factor)
+        self.verticalScrollBar().setValue(round(anchor * self.pages.height()))
+        event.accept()
+
+    def scroll_to(self, page_no, rect=None):
+        if not 0 <= page_no < len(self.pages.page_sizes):
+            return
+
+        top = self.pages.page_rect(page_no).top()
+        if rect is not None:
+            top += round(rect[1] * self.pages.zoom) - self.viewport().height() // 3
+        self.verticalScrollBar().setValue(max(0, top - PAGE_SPACING))
+
+    def sizeHint(self):
+        return QSize(600, 800)
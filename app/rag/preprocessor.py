@@ -1,28 +1,121 @@
 import fitz
 import os
+import threading
 from typing import List
-from spacy.lang.en import English
 
+from .fingerprint import page_fingerprint
+from .ocr import PageOCR, has_text_layer, load_text_layer
+from .chunker import TokenChunker
+from .dedupe import NearDuplicateFilter
+from .search_index import page_words
+from .resources import resource_manager
 
 
-class DocPreprocessor:
-    def __init__(self, file_path):
-        self.file_path = file_path
+def load_sentencizer():
+    from spacy.lang.en import English
+
+    lan = English()
+    lan.add_pipe("sentencizer")
+    return lan
+
+
+# Shared by every preprocessor; sized by the RSS it adds when loaded
+sentencizer = resource_manager.register("spaCy sentencizer", load_sentencizer)
 
-        self.lan = English()
-        self.lan.add_pipe("sentencizer")
 
-    def extract_text(self):
+class DocPreprocessor:
+    def __init__(
+        self,
+        file_path,
+        tokenizer,
+        target_tokens: int = 384,
+        max_tokens: int = 512,
+        overlap_tokens: int = 0,
+        dedupe_threshold: float = 0.8,
+        ocr_enabled: bool = True,
+        ocr_dpi: int = 200,
+        ocr_workers: int | None = None,
+        doc=None,
+        doc_lock=None,
+    ):
+        self.file_path = file_path
+        self.chunker = TokenChunker(tokenizer, target_tokens, max_tokens, overlap_tokens)
+        self.dedupe_threshold = dedupe_threshold
+        self.dedupe_stats = {}
+        self.ocr_enabled = ocr_enabled
+        self.ocr = PageOCR(dpi=ocr_dpi, workers=ocr_workers)
+        self.doc = doc
+        self.doc_lock = doc_lock or threading.RLock()
+        self._page_hashes = {}
+        self._text_layer = None
+        self.search_words = {}
+
+    def open_document(self):
+        if self.doc is None:
+            self.doc = fitz.open(self.file_path)
+
+        return self.doc
+
+    def page_hash(self, page_no):
+        if page_no not in self._page_hashes:
+            with self.doc_lock:
+                self._page_hashes[page_no] = page_fingerprint(self.open_document()[page_no])
+
+        return self._page_hashes[page_no]
+
+    def page_hashes(self):
+        return [self.page_hash(page_no) for page_no in range(len(self.open_document()))]
+
+    def page_occurrence(self, page_no):
+        page_hash = self.page_hash(page_no)
+        return sum(self.page_hash(earlier) == page_hash for earlier in range(page_no))
+
+    def text_layer(self):
+        if self._text_layer is None:
+            with self.doc_lock:
+                self._text_layer = load_text_layer(self.open_document())
+            if self._text_layer:
+                print(f"[OCR] Using embedded text for {len(self._text_layer)} page(s)")
+
+        return self._text_layer
+
+    def extract_text(self, page_numbers=None):
         if self.file_path is None or not os.path.exists(self.file_path):
             return
         
-        doc = fitz.open(self.file_path)
-        text_per_page = []
+        doc = self.open_document()
+        if page_numbers is None:
+            page_numbers = range(len(doc))
+
+        text_per_page = {}
+        scanned_pages = []
+        text_layer = self.text_layer()
+
+        for page_no in page_numbers:
+            # One text page feeds both the search index and the RAG text, so each page
+            # is only parsed once
+            with self.doc_lock:
+                page = doc[page_no]
+                textpage = page.get_textpage()
+                self.search_words[self.page_hash(page_no)] = page_words(page, textpage)
+                text = page.get_text(textpage=textpage) if page_no not in text_layer else None
+
+            if page_no in text_layer:
+                text_per_page[page_no] = self.simple_preprocess(text_layer[page_no])
+                continue
 
-        for page in doc:
-            text = page.get_text()
             cleaned_text = self.simple_preprocess(text)
-            text_per_page.append(cleaned_text)
+            text_per_page[page_no] = cleaned_text
+
+            if not has_text_layer(cleaned_text):
+                scanned_pages.append(page_no)
+
+        if self.ocr_enabled and scanned_pages:
+            scanned_hashes = {page_no: self.page_hash(page_no) for page_no in scanned_pages}
+            for page_no, text in self.ocr.run(doc, scanned_hashes, self.doc_lock).items():
+                ocr_text = self.simple_preprocess(text)
+                if len(ocr_text) > len(text_per_page[page_no]):
+                    text_per_page[page_no] = ocr_text
 
         return text_per_page
 
@@ -37,67 +130,78 @@ class DocPreprocessor:
     def extract_info(self, text_per_page):
         info_per_page = []
 
-        for page_no, text in enumerate(text_per_page):
-            sentences = list(self.lan(text).sents)
-            sentences = [str(sen) for sen in sentences]
-            info_per_page.append(
-                {
-                    "page_number": page_no,
-                    "char_count": len(text),
-                    "word_count": len(text.split(" ")),
-                    "sentences": sentences,
-                    "sentence_count": len(sentences),
-                    "token_count": len(text) / 4,
-                    "text": text
-                }
-            )
+        with sentencizer.use() as lan:
+            for page_no, text in text_per_page.items():
+                sentences = list(lan(text).sents)
+                sentences = [str(sen) for sen in sentences]
+                info_per_page.append(
+                    {
+                        "page_number": page_no,
+                        "page_hash": self.page_hash(page_no),
+                        "occurrence": self.page_occurrence(page_no),
+                        "char_count": len(text),
+                        "word_count": len(text.split(" ")),
+                        "sentences": sentences,
+                        "sentence_count": len(sentences),
+                        "token_count": len(text) / 4,
+                        "text": text
+                    }
+                )
 
         return info_per_page
     
 
-    def sentence_to_chunks(self, processed_contents):
+    def collect_sentences(self, processed_contents, carried_sentences=None):
+        sentences = list(carried_sentences or [])
+
         for item in processed_contents:
-            item["chunks"] = self.split_sentences_to_chunks(item["sentences"])
+            for index, sentence in enumerate(item["sentences"]):
+                sentences.append(
+                    {
+                        "page_number": item["page_number"],
+                        "page_hash": item["page_hash"],
+                        "occurrence": item["occurrence"],
+                        "index": index,
+                        "text": sentence,
+                    }
+                )
 
-        return processed_contents
-    
+        return sorted(sentences, key=lambda sentence: (sentence["page_number"], sentence["index"]))
 
-    def split_sentences_to_chunks(self, sentences, chunk_size: int = 5):
-        chunks = []
 
-        for i in range(0, len(sentences), chunk_size):
-            chunks.append(sentences[i: i+chunk_size])
+    def remove_duplicate_sentences(self, sentences, known_entries=None):
+        dedupe = NearDuplicateFilter(threshold=self.dedupe_threshold)
 
-        return chunks
-    
+        for entry in known_entries or []:
+            dedupe.seed(entry["sentences"])
 
-    def remove_invalid_sentences(self, processed_contents):
-        for item in processed_contents:
-            chunks = item["chunks"]
-            filtered_chunks = []
+        sentences, stats = dedupe.filter(sentences)
+        self.dedupe_stats = stats
+        print(f"[RAG] Skipped {stats['skipped_sentences']} of {stats['sentences']} sentences "
+              f"({stats['skipped_chars']} chars) as near-duplicates")
 
-            for chunk in chunks:
-                temp = []
-                for sentence in chunk:
-                    words = sentence.split()
-                    if len(words) > 3:
-                        temp.append(sentence)
+        return sentences
 
-                if temp:
-                    filtered_chunks.append(temp)
 
-            item["chunks"] = filtered_chunks
+    def sentence_to_chunks(self, sentences):
+        return self.chunker.chunk(sentences)
+    
 
-        return processed_contents
+    def remove_invalid_sentences(self, processed_contents):
+        for item in processed_contents:
+            item["sentences"] = [sentence for sentence in item["sentences"] if len(sentence.split()) > 3]
+            item["sentence_count"] = len(item["sentences"])
 
+        return processed_contents
 
 
-def preprocess_pipeline(doc_path):
-    preprocessor = DocPreprocessor(doc_path)
 
-    contents = preprocessor.extract_text()
+def preprocess_pipeline(preprocessor, page_numbers=None, carried_sentences=None, known_entries=None):
+    contents = preprocessor.extract_text(page_numbers)
     processed_contents = preprocessor.extract_info(contents)
-    processed_contents = preprocessor.sentence_to_chunks(processed_contents)
-    processed_chunks = preprocessor.remove_invalid_sentences(processed_contents)
+    processed_contents = preprocessor.remove_invalid_sentences(processed_contents)
+    sentences = preprocessor.collect_sentences(processed_contents, carried_sentences)
+    sentences = preprocessor.remove_duplicate_sentences(sentences, known_entries)
+    processed_chunks = preprocessor.sentence_to_chunks(sentences)
 
-    return processed_chunks
\ No newline at end of file
+    return processed_chunks
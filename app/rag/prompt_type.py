@@ -7,24 +7,26 @@ class PromptType(Enum):
     OTHER = "other"
 
 
+SYSTEM_PROMPTS = {
+    PromptType.CODE: "You are a coding assistant. Answer precisely and concisely.",
+    PromptType.TEXT: "You are a helpful assistant. Answer based on the document context.",
+    PromptType.OTHER: "You are a general assistant. Use the context to help the user.",
+}
+
+
 @dataclass
 class Prompt:
     context: str
     question: str
     promptType: PromptType = PromptType.TEXT
 
+    def system_prompt(self):
+        return SYSTEM_PROMPTS[self.promptType]
+
     def format_prompt(self):
-        if self.promptType == PromptType.CODE:
-            role = "You are a coding assistant. Answer precisely and concisely."
-        elif self.promptType == PromptType.TEXT:
-            role = "You are a helpful assistant. Answer based on the document context."
-        else:
-            role = "You are a general assistant. Use the context to help the user."
-        
-        return f"""
-        Context:
-        {self.context}
-
-        Question:
-        {self.question}
-        """
\ No newline at end of file
+        # Only the user's turn: the role lives in the system message, which stays the
+        # same for the whole conversation
+        if not self.context:
+            return f"Question:\n{self.question}"
+
+        return f"Context:\n{self.context}\n\nQuestion:\n{self.question}"
@@ -0,0 +1,222 @@
+import ctypes
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+RAM_BUDGET = int(float(os.getenv("DOCUWIZARD_RAM_BUDGET_MB", "3072")) * 1024 * 1024)
+IDLE_UNLOAD_SECONDS = float(os.getenv("DOCUWIZARD_IDLE_UNLOAD_S", "300"))
+LOW_MEMORY_BYTES = 512 * 1024 * 1024
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.2f} GB"
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def available_memory():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def release_memory():
+    gc.collect()
+
+    # Freed tensors and FAISS buffers go back to malloc, which keeps them mapped
+    # unless asked to hand them back to the OS
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class ManagedResource:
+    def __init__(self, name, manager, load, size=None, unload=None):
+        self.name = name
+        self.manager = manager
+        self.loader = load
+        self.sizer = size
+        self.unloader = unload
+        self.value = None
+        self.bytes = 0
+        self.users = 0
+        self.last_used = 0.0
+        self.lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        return self.value is not None
+
+    @contextmanager
+    def use(self):
+        # Users pin the resource, so the idle monitor can never unload it mid-call
+        with self.lock:
+            if self.value is None:
+                self.load()
+            self.users += 1
+            self.last_used = time.monotonic()
+
+        try:
+            yield self.value
+        finally:
+            with self.lock:
+                self.users -= 1
+                self.last_used = time.monotonic()
+
+    def load(self):
+        started = time.perf_counter()
+        rss_before = rss_bytes()
+
+        self.value = self.loader()
+        self.bytes = self.sizer(self.value) if self.sizer else max(0, rss_bytes() - rss_before)
+
+        print(f"[RAG] Loaded {self.name} ({format_bytes(self.bytes)}) in {time.perf_counter() - started:.2f}s")
+        self.manager.enforce_budget(keep=self)
+
+    def update_size(self):
+        with self.lock:
+            if self.value is not None and self.sizer:
+                self.bytes = self.sizer(self.value)
+
+    def unload(self, reason):
+        # A resource that is busy loading or being used is skipped rather than
+        # waited for; two loads evicting each other would otherwise deadlock
+        if not self.lock.acquire(blocking=False):
+            return False
+
+        try:
+            if self.value is None or self.users:
+                return False
+
+            if self.unloader:
+                self.unloader(self.value)
+            freed = self.bytes
+            self.value = None
+            self.bytes = 0
+        finally:
+            self.lock.release()
+
+        release_memory()
+        print(f"[RAG] Unloaded {self.name} ({format_bytes(freed)}): {reason}")
+        return True
+
+
+class ResourceManager:
+    def __init__(self, budget: int = RAM_BUDGET, idle_seconds: float = IDLE_UNLOAD_SECONDS):
+        self.budget = budget
+        self.idle_seconds = idle_seconds
+        self.resources = {}
+        self.lock = threading.Lock()
+        self.monitor = None
+
+    def register(self, name, load, size=None, unload=None):
+        # Registering under an existing name replaces it, so a new document's index
+        # takes over from the previous one instead of adding to it
+        resource = ManagedResource(name, self, load, size, unload)
+        with self.lock:
+            replaced = self.resources.get(name)
+            self.resources[name] = resource
+
+        if replaced is not None:
+            replaced.unload("replaced")
+
+        self.start_monitor()
+        return resource
+
+    def unregister(self, resource):
+        with self.lock:
+            if self.resources.get(resource.name) is resource:
+                del self.resources[resource.name]
+
+        # Something still using it keeps its value until that call returns; after
+        # that it goes with its owner
+        resource.unload("no longer used")
+
+    def resident(self):
+        with self.lock:
+            resources = list(self.resources.values())
+        return {resource.name: resource.bytes for resource in resources if resource.loaded}
+
+    def resident_bytes(self):
+        return sum(self.resident().values())
+
+    def report(self):
+        resident = self.resident()
+        sizes = ", ".join(f"{name} {format_bytes(size)}" for name, size in resident.items()) or "nothing loaded"
+        print(f"[RAG] Resident: {sizes}; {format_bytes(sum(resident.values()))} "
+              f"of {format_bytes(self.budget)} budget")
+
+    def idle_resources(self, exclude=None):
+        with self.lock:
+            resources = [
+                resource for resource in self.resources.values()
+                if resource.loaded and not resource.users and resource is not exclude
+            ]
+        return sorted(resources, key=lambda resource: resource.last_used)
+
+    def enforce_budget(self, keep=None):
+        for resource in self.idle_resources(exclude=keep):
+            if self.resident_bytes() <= self.budget:
+                break
+            resource.unload("over the RAM budget")
+
+        if self.resident_bytes() > self.budget:
+            print(f"[RAG] Still over the RAM budget at {format_bytes(self.resident_bytes())}; nothing else can be unloaded")
+        self.report()
+
+    def unload_idle(self):
+        now = time.monotonic()
+        unloaded = False
+
+        for resource in self.idle_resources():
+            if 0 < self.idle_seconds <= now - resource.last_used:
+                unloaded |= resource.unload(f"idle for {self.idle_seconds:.0f}s")
+
+        available = available_memory()
+        if available is not None and available < LOW_MEMORY_BYTES:
+            for resource in self.idle_resources():
+                unloaded |= resource.unload(f"low system memory ({format_bytes(available)} available)")
+                available = available_memory()
+                if available is None or available >= LOW_MEMORY_BYTES:
+                    break
+
+        if unloaded:
+            self.report()
+
+    def start_monitor(self):
+        if self.monitor is not None:
+            return
+
+        self.monitor = threading.Thread(target=self.run_monitor, name="resource-monitor", daemon=True)
+        self.monitor.start()
+
+    def run_monitor(self):
+        interval = min(30.0, max(1.0, self.idle_seconds / 4)) if self.idle_seconds > 0 else 30.0
+        while True:
+            time.sleep(interval)
+            try:
+                self.unload_idle()
+            except Exception as e:
+                print(f"[ERROR] Resource monitor failed: {e}")
+
+
+resource_manager = ResourceManager()
@@ -0,0 +1,98 @@
+import string
+from bisect import bisect_left
+from dataclasses import dataclass
+from itertools import chain, islice
+
+import fitz
+
+
+STRIP_CHARS = string.punctuation + "“”‘’«»…"
+
+
+@dataclass
+class SearchHit:
+    page_number: int
+    rects: list[tuple[float, float, float, float]]
+    context: str
+
+
+def normalise_word(word):
+    return word.casefold().strip(STRIP_CHARS)
+
+
+def page_words(page, textpage=None):
+    # Boxes are stored as the reader sees the page, so highlights need no knowledge
+    # of /Rotate later on
+    matrix = page.rotation_matrix
+    words = []
+
+    for x0, y0, x1, y1, text, *_ in page.get_text("words", textpage=textpage, sort=True):
+        rect = (fitz.Rect(x0, y0, x1, y1) * matrix).normalize()
+        words.append((text, (rect.x0, rect.y0, rect.x1, rect.y1)))
+
+    return words
+
+
+class TextSearchIndex:
+    def __init__(self, page_hashes, pages):
+        self.page_hashes = list(page_hashes)
+        self.pages = pages
+        self.normalised = []
+        self.postings = {}
+
+        for page_no, page_hash in enumerate(self.page_hashes):
+            words = [normalise_word(text) for text, _ in pages.get(page_hash, [])]
+            self.normalised.append(words)
+
+            for position, word in enumerate(words):
+                if word:
+                    self.postings.setdefault(word, []).append((page_no, position))
+
+        self.tokens = sorted(self.postings)
+
+    def prefix_tokens(self, prefix):
+        for token in islice(self.tokens, bisect_left(self.tokens, prefix), None):
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    def matches(self, page_no, position, terms):
+        words = self.normalised[page_no]
+        if position + len(terms) > len(words):
+            return False
+
+        *exact, last = terms
+        return (
+            all(words[position + offset] == term for offset, term in enumerate(exact))
+            and words[position + len(exact)].startswith(last)
+        )
+
+    def search(self, query, limit: int = 500):
+        terms = [term for term in (normalise_word(word) for word in query.split()) if term]
+        if not terms:
+            return []
+
+        # Every term but the last must match a whole word; the last one may be a
+        # prefix, so results update as the user types
+        if len(terms) > 1:
+            candidates = self.postings.get(terms[0], [])
+        else:
+            candidates = chain.from_iterable(self.postings[token] for token in self.prefix_tokens(terms[0]))
+
+        hits = []
+        for page_no, position in sorted(candidates):
+            if not self.matches(page_no, position, terms):
+                continue
+
+            words = self.pages[self.page_hashes[page_no]]
+            end = position + len(terms)
+            hits.append(SearchHit(
+                page_no,
+                [rect for _, rect in words[position:end]],
+                " ".join(text for text, _ in words[max(0, position - 6): end + 6]),
+            ))
+
+            if len(hits) >= limit:
+                break
+
+        return hits
@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+
+
+DEBOUNCE_MS = 400
+MIN_QUERY_CHARS = 8
+MAX_RESULTS = 8
+WAIT_TIMEOUT_S = 1.0
+
+
+def speculation_key(text):
+    return " ".join(text.split())
+
+
+@dataclass
+class SpeculationStats:
+    started: int = 0
+    cancelled: int = 0
+    completed: int = 0
+    hits: int = 0
+    waited: int = 0
+    misses: int = 0
+    saved_seconds: float = 0.0
+
+    @property
+    def submitted(self):
+        return self.hits + self.waited + self.misses
+
+    @property
+    def hit_rate(self):
+        return (self.hits + self.waited) / self.submitted if self.submitted else 0.0
+
+    @property
+    def wasted(self):
+        return self.completed - self.hits - self.waited
+
+    def summary(self):
+        return (
+            f"hit rate {self.hit_rate:.0%} ({self.hits} ready, {self.waited} in flight, {self.misses} missed), "
+            f"{self.started} started, {self.cancelled} cancelled, {self.wasted} unused, "
+            f"{self.saved_seconds:.2f}s of retrieval saved"
+        )
+
+
+class RetrievalSignals(QObject):
+    finished = Signal(object)
+
+
+class RetrievalTask(QRunnable):
+    def __init__(self, key, signals):
+        super().__init__()
+        self.key = key
+        self.signals = signals
+        self.version = None
+        self.chunks = None
+        self.seconds = 0.0
+        self.done = threading.Event()
+
+    def run(self):
+        from . import llm_router
+
+        started = time.perf_counter()
+        try:
+            self.version, self.chunks = llm_router.retrieve_versioned_context(self.key)
+        except Exception as e:
+            print(f"[ERROR] Speculative retrieval failed: {e}")
+
+        self.seconds = time.perf_counter() - started
+        self.done.set()
+        self.signals.finished.emit(self)
+
+
+class SpeculativeRetriever(QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.enabled = False
+        self.stats = SpeculationStats()
+        self.results = OrderedDict()
+        self.tasks = {}
+        self.pending_key = ""
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.signals = RetrievalSignals(self)
+        self.signals.finished.connect(self.on_finished)
+
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(DEBOUNCE_MS)
+        self.debounce_timer.timeout.connect(self.speculate)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if not enabled:
+            self.debounce_timer.stop()
+            self.cancel_queued()
+            self.results.clear()
+
+    def text_changed(self, text):
+        self.pending_key = speculation_key(text)
+        self.debounce_timer.start()
+
+    def speculate(self):
+        key = self.pending_key
+        if not self.enabled or len(key) < MIN_QUERY_CHARS or key in self.results or key in self.tasks:
+            return
+
+        # Only the newest text is worth retrieving; a running embedding cannot be
+        # interrupted, but anything still queued behind it is dropped
+        self.cancel_queued()
+
+        task = RetrievalTask(key, self.signals)
+        task.setAutoDelete(False)
+        self.tasks[key] = task
+        self.stats.started += 1
+        self.pool.start(task)
+
+    def cancel_queued(self):
+        for key, task in list(self.tasks.items()):
+            if self.pool.tryTake(task):
+                del self.tasks[key]
+                self.stats.cancelled += 1
+
+    def on_finished(self, task):
+        if self.tasks.get(task.key) is not task:
+            return
+
+        del self.tasks[task.key]
+        if task.chunks is None:
+            return
+
+        self.stats.completed += 1
+        self.results[task.key] = task
+        while len(self.results) > MAX_RESULTS:
+            self.results.popitem(last=False)
+
+    def take(self, text):
+        self.debounce_timer.stop()
+        if not self.enabled:
+            return None
+
+        from . import llm_router
+
+        key = speculation_key(text)
+        outcome = "hit"
+
+        task = self.tasks.get(key)
+        if task is not None and self.pool.tryTake(task):
+            # Still queued behind another retrieval, so it would only finish after
+            # that one; the caller retrieves it directly instead
+            del self.tasks[key]
+            self.stats.cancelled += 1
+        elif task is not None:
+            # Already running, which is usually close to done; a retrieval stuck on
+            # a slow model load falls back instead of holding the UI
+            if task.done.wait(WAIT_TIMEOUT_S):
+                self.on_finished(task)
+                outcome = "in flight"
+
+        task = self.results.pop(key, None)
+        if task is None or task.version != llm_router.store_version:
+            self.stats.misses += 1
+            print(f"[RAG] Speculative retrieval missed: {self.stats.summary()}")
+            return None
+
+        if outcome == "hit":
+            self.stats.hits += 1
+            self.stats.saved_seconds += task.seconds
+        else:
+            self.stats.waited += 1
+
+        print(f"[RAG] Speculative retrieval {outcome}: {self.stats.summary()}")
+        return task.chunks
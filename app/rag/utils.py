@@ -1,18 +1,17 @@
 import os
-import markdown
+import threading
 
-from PySide6.QtCore import QUrl
-from PySide6.QtGui import QTextCursor
+import fitz
 
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QLabel, QSizePolicy,
-    QTextEdit, QPushButton
+    QPushButton, QListWidget
 )
 
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEnginePage
-
-from .llm_router import prepare_doc_retrieval, query_llm
+from .chat_transcript import ChatTranscriptView
+from .pdf_viewer import PdfPageView
+from .speculative import SpeculativeRetriever
+from .search_index import SearchHit
 
 
 class DocumentViewer(QWidget):
@@ -20,50 +19,134 @@ class DocumentViewer(QWidget):
         super().__init__()
 
         self.file_path = None
+        self.doc = None
+        self.doc_lock = threading.RLock()
+        self.search_index = None
+        self.search_hits = []
+        self.search_position = -1
 
         self.viewer_layout = QVBoxLayout(self)
-        self.pdf_view = QWebEngineView()
-        self.pdf_view.settings().setAttribute(
-            self.pdf_view.settings().WebAttribute.PluginsEnabled, True
-        )
-        self.pdf_view.settings().setAttribute(
-            self.pdf_view.settings().WebAttribute.PdfViewerEnabled, True
-        )
+        self.pdf_view = PdfPageView()
 
         self.path_label = QLabel("")
         self.path_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         self.viewer_layout.addWidget(self.path_label)
 
-        self.load_pdf("")
-
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("Search text in PDF...")
-        self.search_bar.returnPressed.connect(self.run_search)
+        self.search_bar.textChanged.connect(self.update_search)
+        self.search_bar.returnPressed.connect(self.next_hit)
+
+        self.hit_list = QListWidget()
+        self.hit_list.setMaximumHeight(140)
+        self.hit_list.setVisible(False)
+        self.hit_list.currentRowChanged.connect(self.show_hit)
+
+        self.load_pdf("")
 
         self.viewer_layout.addWidget(self.search_bar)
+        self.viewer_layout.addWidget(self.hit_list)
         self.viewer_layout.addWidget(self.pdf_view)
 
     def load_pdf(self, file_path: str):
         if os.path.exists(file_path):
             self.file_path = file_path
             print(f"[INFO] PDF file exists. Loading....")
-            pdf_url = QUrl.fromLocalFile(self.file_path)
-            pdf_url.setFragment("zoom=page-width")
-            self.pdf_view.setUrl(pdf_url)
+
+            # The viewer and the RAG preprocessor share one open document, guarded by
+            # a lock because pages render on a worker thread
+            with self.doc_lock:
+                if self.doc is not None:
+                    self.doc.close()
+                self.doc = fitz.open(self.file_path)
+
+            self.search_index = None
+            self.clear_search()
+            self.pdf_view.set_document(self.doc, self.doc_lock)
             self.path_label.setText(self.file_path)
             print(f"[INFO] PDF file loaded.")
 
-            prepare_doc_retrieval(self.file_path)
+            # torch, transformers, faiss and spaCy are only imported once a document is opened
+            from .llm_router import prepare_doc_retrieval
+            self.search_index = prepare_doc_retrieval(self.file_path, self.doc, self.doc_lock)
+            self.update_search(self.search_bar.text())
 
         else:
             self.path_label.setText("PDF file not found.")
-            self.pdf_view.setHtml("<h2 style='color:red; text-align:center;'>File not found.</h2>")
+            self.pdf_view.clear()
+
+    def clear_search(self):
+        self.search_hits = []
+        self.search_position = -1
+        self.hit_list.clear()
+        self.hit_list.setVisible(False)
+        self.pdf_view.pages.set_highlights({})
+
+    def update_search(self, text):
+        query = text.strip()
+        if not query or self.doc is None:
+            self.clear_search()
+            if self.file_path:
+                self.path_label.setText(self.file_path)
+            return
 
-    def run_search(self):
+        if self.search_index is None:
+            # Without an index (retrieval failed to prepare) every keystroke would
+            # rescan the document, so the slow path waits for Enter
+            self.clear_search()
+            return
+
+        self.search_hits = self.search_index.search(query)
+        self.show_hits(query)
+
+    def scan_document(self, query):
+        with self.doc_lock:
+            return [
+                SearchHit(page.number, [tuple(rect * page.rotation_matrix)], "")
+                for page in self.doc for rect in page.search_for(query)
+            ]
+
+    def show_hits(self, query):
+        self.search_position = -1
+
+        highlights = {}
+        for hit in self.search_hits:
+            highlights.setdefault(hit.page_number, []).extend(hit.rects)
+        self.pdf_view.pages.set_highlights(highlights)
+
+        self.hit_list.blockSignals(True)
+        self.hit_list.clear()
+        for hit in self.search_hits:
+            self.hit_list.addItem(f"p. {hit.page_number + 1} — {hit.context}" if hit.context else f"p. {hit.page_number + 1}")
+        self.hit_list.blockSignals(False)
+        self.hit_list.setVisible(bool(self.search_hits))
+
+        if self.search_hits:
+            self.path_label.setText(f"{self.file_path}  ({len(self.search_hits)} matches)")
+        else:
+            self.path_label.setText(f"No matches for \"{query}\"")
+
+    def next_hit(self):
         query = self.search_bar.text().strip()
-        if query:
-            self.pdf_view.page().findText(query, QWebEnginePage.FindFlag.FindCaseSensitively)
+        if not query or self.doc is None:
+            return
 
+        if self.search_index is None and not self.search_hits:
+            self.search_hits = self.scan_document(query)
+            self.show_hits(query)
+
+        if self.search_hits:
+            self.hit_list.setCurrentRow((self.search_position + 1) % len(self.search_hits))
+
+    def show_hit(self, row):
+        if not 0 <= row < len(self.search_hits):
+            return
+
+        self.search_position = row
+        hit = self.search_hits[row]
+        self.pdf_view.pages.set_highlights(self.pdf_view.pages.highlights, hit.page_number, hit.rects)
+        self.pdf_view.scroll_to(hit.page_number, hit.rects[0] if hit.rects else None)
+        self.path_label.setText(f"{self.file_path}  ({row + 1}/{len(self.search_hits)})")
 
 
 class ChatInterface(QWidget):
@@ -77,10 +160,11 @@ class ChatInterface(QWidget):
         self.title = QLabel("Chat with DocuWizard Assistant")
         self.title.setStyleSheet("font-weight: bold; font-size: 16px; margin-bottom: 6px;")
 
-        self.chat_area = QTextEdit()
-        self.chat_area.setReadOnly(True)
+        # Messages live in a model/view transcript: each one is rendered to HTML once
+        # and only the rows on screen are painted
+        self.chat_area = ChatTranscriptView()
         self.chat_area.setStyleSheet("""
-            QTextEdit {
+            QListView {
                 border: none;
                 font-size: 14px;
                 padding: 4px;
@@ -88,9 +172,14 @@ class ChatInterface(QWidget):
             }
         """)
 
+        # Context is retrieved in the background while the question is typed, so
+        # submitting usually goes straight to the LLM
+        self.retriever = SpeculativeRetriever(self)
+
         self.input_field = QLineEdit()
         self.input_field.setPlaceholderText("Type your question here...")
         self.input_field.returnPressed.connect(self.handle_user_input)
+        self.input_field.textChanged.connect(self.retriever.text_changed)
         self.input_field.setStyleSheet("""
             QLineEdit {
                 padding: 8px;
@@ -126,42 +215,17 @@ class ChatInterface(QWidget):
         layout.addLayout(input_layout)
 
     def append_message(self, text: str, sender: str):
-        bg_color = "#d0e7ff" if sender == "user" else "#d0ffd6"
-        align = "right" if sender == "user" else "left"
-        name = "You" if sender == "user" else "Assistant"
-
-        html_body = markdown.markdown(text, extensions=["extra", "sane_lists"])
-
-        bubble_html = f"""
-        <table width="100%" cellspacing="0" cellpadding="4">
-        <tr>
-            <td align="{align}">
-                <div style="
-                    background-color: {bg_color};
-                    color: #000;
-                    border-radius: 10px;
-                    padding: 8px 12px;
-                    display: inline-block;
-                    max-width: 60%;
-                    font-size: 14px;">
-                    <b>{name}:</b> {html_body}
-                </div>
-            </td>
-        </tr>
-        </table>
-        """
-
-        self.chat_area.insertHtml(bubble_html)
-        self.chat_area.insertHtml("<br>")
-        self.chat_area.moveCursor(QTextCursor.End)
+        self.chat_area.append_message(text, sender)
 
     def handle_user_input(self):
         user_text = self.input_field.text().strip()
         if not user_text:
             return
 
+        context = self.retriever.take(user_text)
         self.append_message(user_text, sender="user")
         self.input_field.clear()
 
-        response = query_llm(user_text, "online")
+        from .llm_router import query_llm
+        response = query_llm(user_text, "online", context=context)
         self.append_message(response, sender="assistant")
\ No newline at end of file
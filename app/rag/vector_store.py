@@ -1,34 +1,105 @@
+import os
+
 import faiss
 import numpy as np
 
+from .resources import resource_manager
+
+
+# gte-multilingual embeddings are trained to stay useful when cut to a prefix of
+# their dimensions, so the index holds short vectors and the full ones only decide
+# the final order among its candidates
+SEARCH_DIM = int(os.getenv("DOCUWIZARD_SEARCH_DIM", "256"))
+RESCORE_FACTOR = 10
+
+
 class ContentStore:
-    def __init__(self, chunk_entries):
+    def __init__(self, chunk_entries, search_dim: int = SEARCH_DIM, rescore_factor: int = RESCORE_FACTOR):
         self.chunk_entries = chunk_entries
-        self.embedding_matrix = self.build_embedding_matrix()
-        self.index = self.build_index()
         self.chunk_id_map = self.build_chunk_map()
+        self.search_dim = search_dim
+        self.rescore_factor = rescore_factor
+
+        # The index is built from the chunk embeddings on first query and again after
+        # being unloaded, so only the entries themselves always stay resident
+        self.index_resource = resource_manager.register("FAISS index", self.build_index, self.index_bytes)
 
 
-    def build_embedding_matrix(self, normalize=True):
-        embedding_matrix = np.array([entry["embedding"] for entry in self.chunk_entries]).astype("float32")
+    def close(self):
+        resource_manager.unregister(self.index_resource)
+
+
+    def build_embedding_matrix(self, chunk_entries, normalize=True, dim=None):
+        embedding_matrix = np.array([entry["embedding"] for entry in chunk_entries]).astype("float32")[:, :dim]
         if normalize:
             embedding_matrix = embedding_matrix / np.linalg.norm(embedding_matrix, axis=1, keepdims=True)
 
         return embedding_matrix
-    
+
 
     def build_index(self):
-        index = faiss.IndexFlatIP(self.embedding_matrix.shape[1])
-        index.add(self.embedding_matrix)
+        embedding_matrix = self.build_embedding_matrix(list(self.chunk_id_map.values()), dim=self.search_dim)
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(embedding_matrix.shape[1]))
+        index.add_with_ids(embedding_matrix, np.fromiter(self.chunk_id_map, dtype="int64"))
 
         return index
-    
+
+
+    @staticmethod
+    def index_bytes(index):
+        # Flat vectors plus the id map and its reverse lookup
+        return index.ntotal * (index.d * 4 + 24)
+
 
     def build_chunk_map(self):
         return {i: entry for i, entry in enumerate(self.chunk_entries)}
 
 
+    def update(self, stale_entries, new_entries):
+        stale_chunk_ids = {entry["chunk_id"] for entry in stale_entries}
+        stale_ids = [i for i, entry in self.chunk_id_map.items() if entry["chunk_id"] in stale_chunk_ids]
+
+        with self.index_resource.lock:
+            index = self.index_resource.value
+
+            if stale_ids:
+                if index is not None:
+                    index.remove_ids(np.array(stale_ids, dtype="int64"))
+                for i in stale_ids:
+                    del self.chunk_id_map[i]
+
+            if new_entries:
+                next_id = max(self.chunk_id_map, default=-1) + 1
+                new_ids = np.arange(next_id, next_id + len(new_entries), dtype="int64")
+                if index is not None:
+                    index.add_with_ids(self.build_embedding_matrix(new_entries, dim=self.search_dim), new_ids)
+                self.chunk_id_map.update(zip(new_ids.tolist(), new_entries))
+
+        self.index_resource.update_size()
+        self.chunk_entries = list(self.chunk_id_map.values())
+
+
     def query(self, query_embedding, top_k=5):
+        return [self.chunk_id_map[i]["text"] for i in self.search(query_embedding, top_k)]
+
+
+    def search(self, query_embedding, top_k=5):
+        query_embedding = np.asarray(query_embedding, dtype="float32")
         top_k = min(len(self.chunk_entries), top_k)
-        D, I = self.index.search(np.array([query_embedding]), top_k)
-        return [self.chunk_id_map[i]["text"] for i in I[0]]
\ No newline at end of file
+
+        with self.index_resource.use() as index:
+            if index.d >= len(query_embedding):
+                D, I = index.search(np.array([query_embedding]), top_k)
+                return [i for i in I[0] if i != -1]
+
+            coarse_query = query_embedding[:index.d] / np.linalg.norm(query_embedding[:index.d])
+            candidates = min(len(self.chunk_entries), top_k * self.rescore_factor)
+            D, I = index.search(np.array([coarse_query]), candidates)
+
+        candidate_ids = [i for i in I[0] if i != -1]
+        if not candidate_ids:
+            return []
+
+        full_matrix = self.build_embedding_matrix([self.chunk_id_map[i] for i in candidate_ids])
+        scores = full_matrix @ (query_embedding / np.linalg.norm(query_embedding))
+        return [candidate_ids[j] for j in np.argsort(-scores, kind="stable")[:top_k]]
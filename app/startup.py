@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+
+
+class _TimedLoader:
+    def __init__(self, timer, loader):
+        self._timer = timer
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        with self._timer.measure(spec.name):
+            return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+
+        with self._timer.measure(module.__name__):
+            self._loader.exec_module(module)
+
+
+class _Measurement:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer._stack.append([self.name, time.perf_counter(), 0.0])
+
+    def __exit__(self, *exc):
+        name, start, children = self.timer._stack.pop()
+        elapsed = time.perf_counter() - start
+
+        cumulative, own = self.timer.timings.get(name, (0.0, 0.0))
+        self.timer.timings[name] = (cumulative + elapsed, own + elapsed - children)
+
+        if self.timer._stack:
+            self.timer._stack[-1][2] += elapsed
+
+
+class ImportTimer:
+    def __init__(self):
+        self.timings = {}
+        self._stack = []
+        self.started_at = time.perf_counter()
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def measure(self, name):
+        return _Measurement(self, name)
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(self, spec.loader)
+                return spec
+
+        return None
+
+    def report(self, label: str, limit: int = 20):
+        elapsed = time.perf_counter() - self.started_at
+        total_import = sum(own for _, own in self.timings.values())
+
+        packages = {}
+        for name, (_, own) in self.timings.items():
+            root = name.split(".")[0]
+            packages[root] = packages.get(root, 0.0) + own
+
+        print(f"[STARTUP] {label}: {elapsed * 1000:.0f} ms since launch, "
+              f"{total_import * 1000:.0f} ms in {len(self.timings)} module imports")
+
+        print(f"[STARTUP] {'self ms':>9} package")
+        for root, own in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:limit]:
+            print(f"[STARTUP] {own * 1000:9.1f} {root}")
+
+        print(f"[STARTUP] {'cum ms':>9} {'self ms':>9} module")
+        ranked = sorted(self.timings.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (cumulative, own) in ranked[:limit]:
+            print(f"[STARTUP] {cumulative * 1000:9.1f} {own * 1000:9.1f} {name}")
+
+        self.timings = {}
+
+
+import_timer = None
+
+
+def enable_startup_report():
+    global import_timer
+
+    if import_timer is None and os.getenv("DOCUWIZARD_STARTUP_REPORT"):
+        import_timer = ImportTimer()
+        import_timer.install()
+
+    return import_timer
+
+
+def report_startup(label: str):
+    if import_timer is not None:
+        import_timer.report(label)
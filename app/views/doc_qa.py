@@ -51,6 +51,7 @@ class DocumentQAView(QWidget):
             self.doc["extension"] = file_path.split(".")[-1]
 
             self.viewer.load_pdf(file_path)
+            self.chat.retriever.set_enabled(self.viewer.search_index is not None)
 
             print(f"[INFO] PDF widget added.")
 
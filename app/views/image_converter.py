@@ -1,3 +1,6 @@
+import copy
+
+from PySide6.QtCore import QThreadPool
 from PySide6.QtWidgets import (
     QWidget,
     QPushButton,
@@ -5,16 +8,18 @@ from PySide6.QtWidgets import (
     QFileDialog,
     QMessageBox,
     QSizePolicy,
-    QScrollArea,
-    QHBoxLayout
+    QHBoxLayout,
+    QLabel,
+    QProgressBar
 )
 
-from PIL import Image
-from app.image_export.utils import ImagePreviewerDialog, ThumbnailLabel, FlowLayout
+from app.image_export.utils import ImagePreviewerDialog, ExportOptionsDialog
+from app.image_export.exporter import PdfExporter
+from app.image_export.export_job import ExportJob
+from app.image_export.thumbnail_grid import ThumbnailGridView
 
 from app.image_export.styles import (
     upload_button_style,
-    thumbnail_style,
     global_style
 )
 
@@ -24,6 +29,9 @@ class ImageExportView(QWidget):
         super().__init__()
         self.image_paths = []
         self.images_settings = dict()
+        self.export_job = None
+        self.export_pool = QThreadPool(self)
+        self.export_pool.setMaxThreadCount(1)
         self.setStyleSheet(global_style)
 
         self.view_layout = QVBoxLayout(self)
@@ -41,12 +49,8 @@ class ImageExportView(QWidget):
         self.upload_layout.addWidget(self.upload_button)
         self.upload_layout.addStretch()
 
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_content = QWidget()
-        self.flow_layout = FlowLayout(self.scroll_content)
-        self.scroll_content.setLayout(self.flow_layout)
-        self.scroll_area.setWidget(self.scroll_content)
+        self.thumbnail_grid = ThumbnailGridView()
+        self.thumbnail_grid.imageActivated.connect(self.open_image_editor)
 
         self.convert_button = QPushButton("Convert to PDF")
         self.convert_button.setStyleSheet("border-radius: 0px; padding: 6px;")
@@ -57,8 +61,24 @@ class ImageExportView(QWidget):
         self.convert_layout.addWidget(self.convert_button)
         self.convert_layout.addStretch()
 
+        self.export_progress_bar = QProgressBar()
+        self.export_progress_bar.setTextVisible(False)
+        self.export_status_label = QLabel()
+        self.export_cancel_button = QPushButton("Cancel")
+        self.export_cancel_button.setStyleSheet("border-radius: 0px; padding: 6px;")
+        self.export_cancel_button.clicked.connect(self.cancel_export)
+
+        self.export_widget = QWidget()
+        self.export_layout = QHBoxLayout(self.export_widget)
+        self.export_layout.setContentsMargins(0, 0, 0, 0)
+        self.export_layout.addWidget(self.export_progress_bar, 1)
+        self.export_layout.addWidget(self.export_status_label)
+        self.export_layout.addWidget(self.export_cancel_button)
+        self.export_widget.hide()
+
         self.view_layout.addLayout(self.upload_layout)
-        self.view_layout.addWidget(self.scroll_area)
+        self.view_layout.addWidget(self.thumbnail_grid)
+        self.view_layout.addWidget(self.export_widget)
         self.view_layout.addLayout(self.convert_layout)
 
     def upload_images(self):
@@ -69,56 +89,89 @@ class ImageExportView(QWidget):
             self.render_thumbnails()
 
     def render_thumbnails(self):
-        for i in reversed(range(self.flow_layout.count())):
-            item = self.flow_layout.takeAt(i)
-            if item:
-                item.widget().deleteLater()
-
-        for path in self.image_paths:
-            thumb = ThumbnailLabel(path)
-            thumb.setFixedSize(120, 120)
-            thumb.setStyleSheet(thumbnail_style)
-            thumb.doubleClicked.connect(self.open_image_editor)
-            self.flow_layout.addWidget(thumb)
+        self.thumbnail_grid.set_paths(self.image_paths)
 
     def open_image_editor(self, image_path):
-        index = self.image_paths.index(image_path)
+        ordered_paths = self.thumbnail_grid.ordered_paths()
+        index = ordered_paths.index(image_path)
 
-        dialog = ImagePreviewerDialog(self.image_paths, index, self.images_settings)
+        dialog = ImagePreviewerDialog(ordered_paths, index, self.images_settings)
         if dialog.exec():
             self.images_settings = dialog.get_images_settings()
 
-    def apply_settings(self, ordered_paths):
-        processed_images = []
-
-        for path in ordered_paths:
-            image = Image.open(path).convert("RGB")
-            settings = self.images_settings.get(path, {})
-            rotation = settings.get('rotation', {}).get('angle', 0)
-            if rotation != 0:
-                image = image.rotate(-rotation, expand=True)
-            processed_images.append(image)
+    def report_export_progress(self, progress):
+        self.export_progress_bar.setMaximum(progress.total_pages)
+        self.export_progress_bar.setValue(progress.pages_done)
 
-        return processed_images
+        minutes, seconds = divmod(round(progress.seconds_remaining), 60)
+        self.export_status_label.setText(
+            f"{progress.pages_done}/{progress.total_pages} pages · {progress.mb_per_second:.1f} MB/s · "
+            f"{minutes}:{seconds:02d} left"
+        )
 
     def convert_to_pdf(self):
         if not self.image_paths:
             QMessageBox.warning(self, "No Images", "Please upload images first.")
             return
-        
-        ordered_paths = []
-        for i in range(self.flow_layout.count()):
-            widget = self.flow_layout.itemAt(i).widget()
-            if isinstance(widget, ThumbnailLabel):
-                ordered_paths.append(widget.image_path)
 
-        save_path, _ = QFileDialog.getSaveFileName(self, "Save PDF", "", "PDF Files (*.pdf)")
+        if self.export_job is not None:
+            QMessageBox.information(self, "Export Running", "Please wait for the current export to finish.")
+            return
 
-        if save_path:
-            try:
-                processed_images = self.apply_settings(ordered_paths)
+        ordered_paths = self.thumbnail_grid.ordered_paths()
+        images_settings = copy.deepcopy(self.images_settings)
+
+        options = ExportOptionsDialog(
+            lambda profile: PdfExporter(images_settings, profile).estimate(ordered_paths), self
+        )
+        if not options.exec():
+            return
+
+        save_path, _ = QFileDialog.getSaveFileName(self, "Save PDF", "", "PDF Files (*.pdf)")
+        if not save_path:
+            return
 
-                processed_images[0].save(save_path, save_all=True, append_images=processed_images[1:])
-                QMessageBox.information(self, "Success", "PDF created successfully!")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to convert: {str(e)}")
\ No newline at end of file
+        # The job works on a snapshot of the order and edits, so the grid stays free
+        # for arranging the next batch while this one exports
+        job = ExportJob(PdfExporter(images_settings, options.selected_profile()), ordered_paths, save_path)
+        job.signals.progress.connect(self.report_export_progress)
+        job.signals.finished.connect(self.export_finished)
+        job.signals.failed.connect(self.export_failed)
+        job.signals.cancelled.connect(self.export_cancelled)
+        job.setAutoDelete(False)
+
+        self.export_job = job
+        self.export_progress_bar.setMaximum(len(ordered_paths))
+        self.export_progress_bar.setValue(0)
+        self.export_status_label.setText(f"0/{len(ordered_paths)} pages")
+        self.export_cancel_button.setEnabled(True)
+        self.export_widget.show()
+        self.convert_button.setEnabled(False)
+
+        self.export_pool.start(job)
+
+    def cancel_export(self):
+        if self.export_job is not None:
+            self.export_cancel_button.setEnabled(False)
+            self.export_status_label.setText("Cancelling...")
+            self.export_job.cancel()
+
+    def end_export(self):
+        self.export_job = None
+        self.export_widget.hide()
+        self.convert_button.setEnabled(True)
+
+    def export_finished(self, progress):
+        self.end_export()
+        QMessageBox.information(
+            self, "Success",
+            f"PDF created successfully!\n{progress.pages_done} pages in {progress.elapsed:.1f} s "
+            f"({progress.mb_per_second:.1f} MB/s)"
+        )
+
+    def export_failed(self, message):
+        self.end_export()
+        QMessageBox.critical(self, "Error", f"Failed to convert: {message}")
+
+    def export_cancelled(self):
+        self.end_export()
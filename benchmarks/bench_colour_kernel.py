@@ -0,0 +1,54 @@
+import argparse
+import time
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from app.image_export.processing import adjust_colours
+
+
+def pil_chain(image, brightness, contrast, saturation):
+    image = ImageEnhance.Brightness(image).enhance(brightness)
+    image = ImageEnhance.Contrast(image).enhance(contrast)
+    image = ImageEnhance.Color(image).enhance(saturation)
+    return image
+
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the fused colour kernel with the ImageEnhance chain")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 12, 24], help="image sizes in megapixels")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--mode", default="RGB", choices=["RGB", "RGBA"])
+    args = parser.parse_args()
+
+    factors = (1.1, 0.8, 1.2)
+    rng = np.random.default_rng(0)
+
+    print(f"{'MP':>4} {'ImageEnhance ms':>16} {'fused ms':>10} {'speed-up':>9} {'max diff':>9}")
+    for megapixels in args.sizes:
+        width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+        height = int(megapixels * 1e6 / width)
+        channels = len(args.mode)
+        pixels = rng.integers(32, 224, size=(height, width, channels), dtype=np.uint8)
+        image = Image.fromarray(pixels)
+
+        chain_time, expected = best_of(lambda: pil_chain(image, *factors), args.repeats)
+        fused_time, actual = best_of(lambda: adjust_colours(image, *factors), args.repeats)
+
+        diff = np.abs(np.asarray(expected, dtype=np.int16)[..., :3] - np.asarray(actual, dtype=np.int16)[..., :3]).max()
+        del expected, actual
+        print(f"{megapixels:>4} {chain_time * 1000:16.1f} {fused_time * 1000:10.1f} "
+              f"{chain_time / fused_time:8.2f}x {diff:9d}")
+
+
+if __name__ == "__main__":
+    main()
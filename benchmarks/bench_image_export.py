@@ -0,0 +1,396 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+
+FORMATS = {"jpeg": ".jpg", "png": ".png"}
+
+
+def generate_pixels(megapixels, seed):
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    rng = np.random.default_rng(seed)
+
+    # A gradient with mild noise compresses roughly like a scan, unlike pure noise
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[..., 0] = (x + y) / 2
+    pixels[..., 1] = x[::-1] * 0.6 + 40
+    pixels[..., 2] = y * 0.8 + 20
+    return np.clip(pixels + rng.integers(-12, 12, size=pixels.shape), 0, 255).astype(np.uint8)
+
+
+def save_pixels(path, pixels):
+    Image.fromarray(pixels).save(path, quality=90) if path.endswith(".jpg") else Image.fromarray(pixels).save(path)
+
+
+def generate_image(path, megapixels, seed):
+    save_pixels(path, generate_pixels(megapixels, seed))
+
+
+def generate_pages(paths, megapixels, seed):
+    # Every page gets its own content, stamped as two flat blocks that survive JPEG,
+    # so the content-keyed page cache cannot turn one encode into the whole export
+    pixels = generate_pixels(megapixels, seed)
+    for page, path in enumerate(paths):
+        pixels[:32, :32] = page % 256 * 53 % 256
+        pixels[:32, 32:64] = page // 256 * 53 % 256
+        save_pixels(path, pixels)
+
+
+def summarise(timings):
+    timings = sorted(timings)
+    return {
+        "count": len(timings),
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+        "max_ms": timings[-1] * 1000,
+    }
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.baseline = rss_bytes()
+        self.peak = self.baseline
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            self.peak = max(self.peak, rss_bytes())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        self.peak = max(self.peak, rss_bytes())
+        return self.peak, self.peak - self.baseline
+
+
+def wait(ms):
+    from PySide6.QtCore import QEventLoop, QTimer
+
+    loop = QEventLoop()
+    QTimer.singleShot(ms, loop.quit)
+    loop.exec()
+
+
+def wait_for(signal, timeout_ms=60000):
+    from PySide6.QtCore import QEventLoop, QTimer
+
+    fired = []
+    loop = QEventLoop()
+
+    def on_signal(*args):
+        fired.append(args)
+        loop.quit()
+
+    signal.connect(on_signal)
+    QTimer.singleShot(timeout_ms, loop.quit)
+    loop.exec()
+    signal.disconnect(on_signal)
+
+    if not fired:
+        raise TimeoutError("timed out waiting for signal")
+    return fired[0]
+
+
+def bench_render_image(path, events):
+    from app.image_export.utils import ImagePreviewerDialog
+
+    dialog = ImagePreviewerDialog([path], 0, {})
+    dialog.resize(1200, 800)
+    dialog.show()
+    wait_for(dialog.renderer.rendered)
+
+    # One slider event at a time gives the latency a user sees after letting go,
+    # a burst at 60 Hz shows how many renders the debounce actually runs
+    latencies = []
+    for step in range(events):
+        started = time.perf_counter()
+        dialog.update_brightness(80 + step % 40)
+        wait_for(dialog.renderer.rendered)
+        dialog.image_label.repaint()
+        latencies.append(time.perf_counter() - started)
+
+    renders = []
+    dialog.renderer.rendered.connect(lambda image: renders.append(time.perf_counter()))
+    started = time.perf_counter()
+    for step in range(events):
+        dialog.update_contrast(80 + step % 40)
+        wait(16)
+    while dialog.renderer.busy or dialog.renderer.pending is not None or dialog.renderer.debounce_timer.isActive():
+        wait(5)
+    burst_seconds = time.perf_counter() - started
+
+    dialog.done(0)
+    dialog.deleteLater()
+
+    return {
+        "slider_event": summarise(latencies),
+        "burst": {"events": events, "renders": len(renders), "seconds": burst_seconds},
+    }
+
+
+def bench_thumbnails(paths, size):
+    from app.views.image_converter import ImageExportView
+
+    results = {}
+    for run in ("cold", "warm"):
+        view = ImageExportView()
+        view.resize(*size)
+        view.show()
+        wait(50)
+
+        model = view.thumbnail_grid.thumbnail_model
+        view.image_paths = paths
+
+        started = time.perf_counter()
+        view.render_thumbnails()
+        wait(1)
+        while not model.pixmaps or model.requested:
+            wait(2)
+        first_screen = time.perf_counter() - started
+
+        scrollbar = view.thumbnail_grid.verticalScrollBar()
+        screens = 0
+        scroll_started = time.perf_counter()
+        while scrollbar.value() < scrollbar.maximum():
+            scrollbar.setValue(scrollbar.value() + scrollbar.pageStep())
+            wait(1)
+            while model.requested:
+                wait(2)
+            screens += 1
+        scroll_seconds = time.perf_counter() - scroll_started
+
+        loaded = len(model.pixmaps)
+        results[run] = {
+            "images": len(paths),
+            "first_screen_ms": first_screen * 1000,
+            "screens_scrolled": screens,
+            "thumbnails_loaded": loaded,
+            "thumbnails_per_second": loaded / (first_screen + scroll_seconds),
+        }
+
+        view.close()
+        view.deleteLater()
+        wait(10)
+
+    return results
+
+
+def bench_zoom(path, steps):
+    from PySide6.QtCore import QPoint, QPointF, Qt
+    from PySide6.QtGui import QPixmap, QWheelEvent
+    from PySide6.QtWidgets import QScrollArea
+
+    from app.image_export.utils import ZoomableImageLabel
+
+    scroll_area = QScrollArea()
+    scroll_area.setWidgetResizable(True)
+    scroll_area.resize(1200, 800)
+    label = ZoomableImageLabel()
+    scroll_area.setWidget(label)
+    scroll_area.show()
+
+    pixmap = QPixmap(path)
+    label.setPixmap(pixmap)
+    wait(10)
+
+    def wheel(delta):
+        event = QWheelEvent(
+            QPointF(10, 10), QPointF(10, 10), QPoint(), QPoint(0, delta),
+            Qt.NoButton, Qt.NoModifier, Qt.NoScrollPhase, False
+        )
+        started = time.perf_counter()
+        label.wheelEvent(event)
+        label.repaint()
+        return time.perf_counter() - started
+
+    zoom_out = [wheel(-120) for _ in range(steps)]
+    zoom_in = [wheel(120) for _ in range(steps)]
+
+    started = time.perf_counter()
+    label.finish_zoom()
+    label.repaint()
+    smooth_repaint = time.perf_counter() - started
+
+    scroll_area.close()
+    scroll_area.deleteLater()
+
+    return {
+        "image": [pixmap.width(), pixmap.height()],
+        "zoom_out_step": summarise(zoom_out),
+        "zoom_in_step": summarise(zoom_in),
+        "smooth_repaint_ms": smooth_repaint * 1000,
+    }
+
+
+def bench_export(paths, settings, profile, output_dir, warm=False):
+    from PySide6.QtCore import QThreadPool
+
+    from app.image_export.export_job import ExportJob
+    from app.image_export.exporter import PdfExporter
+    from app.image_export.processed_cache import ocr_cache, page_cache
+
+    # Cold runs measure encoding; a warm run repeats an export with the pages and
+    # OCR results of the previous one still cached
+    if not warm:
+        page_cache.clear(spilled=True)
+        ocr_cache.clear(spilled=True)
+
+    save_path = os.path.join(output_dir, "bench.pdf")
+    pool = QThreadPool()
+    pool.setMaxThreadCount(1)
+
+    job = ExportJob(PdfExporter(settings, profile), paths, save_path)
+    job.setAutoDelete(False)
+
+    sampler = RssSampler()
+    pool.start(job)
+    progress = wait_for(job.signals.finished, timeout_ms=600000)[0]
+    pool.waitForDone()
+    peak, growth = sampler.stop()
+
+    output_bytes = os.path.getsize(save_path)
+    os.remove(save_path)
+
+    return {
+        "profile": profile.name,
+        "cache": "warm" if warm else "cold",
+        "pages": progress.pages_done,
+        "seconds": progress.elapsed,
+        "pages_per_second": progress.pages_per_second,
+        "mb_per_second": progress.mb_per_second,
+        "input_mb": progress.input_bytes / (1024 * 1024),
+        "output_mb": output_bytes / (1024 * 1024),
+        "peak_rss_mb": peak / (1024 * 1024),
+        "rss_growth_mb": growth / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the image editor and PDF export paths headlessly")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[2, 12], help="image sizes in megapixels")
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=list(FORMATS))
+    parser.add_argument("--slider-events", type=int, default=30)
+    parser.add_argument("--zoom-steps", type=int, default=20)
+    parser.add_argument("--thumbnails", type=int, default=300, help="number of images in the thumbnail grid")
+    parser.add_argument("--export-pages", type=int, default=20)
+    parser.add_argument("--profiles", nargs="+", default=["Original", "Screen"], help="export profiles to run")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="docuwizard-bench-")
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ["DOCUWIZARD_CACHE_DIR"] = os.path.join(work_dir, "cache")
+
+    from PySide6 import __version__ as pyside_version
+    from PySide6.QtWidgets import QApplication
+    from PIL import __version__ as pillow_version
+
+    from app.image_export.profiles import EXPORT_PROFILES
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "pyside": pyside_version,
+        "pillow": pillow_version,
+        "cpu_count": os.cpu_count(),
+        "args": vars(args),
+        "cases": [],
+    }
+
+    try:
+        for megapixels in args.sizes:
+            for image_format in args.formats:
+                name = f"{megapixels:g}mp-{image_format}"
+                path = os.path.join(work_dir, name + FORMATS[image_format])
+                generate_image(path, megapixels, seed=len(report["cases"]))
+                print(f"[BENCH] {name}", file=sys.stderr)
+
+                pages = [
+                    os.path.join(work_dir, f"{name}-{page:04d}{FORMATS[image_format]}")
+                    for page in range(args.export_pages)
+                ]
+                generate_pages(pages, megapixels, seed=len(report["cases"]))
+
+                edited = {
+                    page: {
+                        'rotation': {'angle': 0},
+                        'brightness': {'factor': 1.1},
+                        'contrast': {'factor': 1.2},
+                        'saturation': {'factor': 0.9},
+                    }
+                    for page in pages
+                }
+
+                report["cases"].append({
+                    "name": name,
+                    "megapixels": megapixels,
+                    "format": image_format,
+                    "file_mb": os.path.getsize(path) / (1024 * 1024),
+                    "render_image": bench_render_image(path, args.slider_events),
+                    "zoom": bench_zoom(path, args.zoom_steps),
+                    "export": [
+                        dict(bench_export(pages, {}, EXPORT_PROFILES[profile], work_dir), edits=False)
+                        for profile in args.profiles
+                    ] + [
+                        dict(bench_export(pages, edited, EXPORT_PROFILES[args.profiles[0]], work_dir), edits=True),
+                        dict(bench_export(pages, edited, EXPORT_PROFILES[args.profiles[0]], work_dir, warm=True), edits=True),
+                    ],
+                })
+
+                for page_path in pages:
+                    os.remove(page_path)
+
+        smallest = min(args.sizes)
+        thumbnail_source = os.path.join(work_dir, f"{smallest:g}mp-{args.formats[0]}{FORMATS[args.formats[0]]}")
+        thumbnail_paths = []
+        for index in range(args.thumbnails):
+            thumbnail_path = os.path.join(work_dir, f"thumb-{index:05d}{FORMATS[args.formats[0]]}")
+            shutil.copyfile(thumbnail_source, thumbnail_path)
+            thumbnail_paths.append(thumbnail_path)
+
+        print("[BENCH] thumbnails", file=sys.stderr)
+        report["thumbnails"] = bench_thumbnails(thumbnail_paths, (1200, 800))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
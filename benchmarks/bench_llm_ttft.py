@@ -0,0 +1,92 @@
+import argparse
+import contextlib
+import io
+import pickle
+import statistics
+
+import numpy as np
+
+from app.rag.conversation import Conversation
+from app.rag.llm_client import query_local_llm
+
+
+WORDS = (
+    "invoice contract payment schedule delivery warranty clause party agreement term notice "
+    "liability period amount supplier customer service report section annex total date"
+).split()
+
+
+def synthetic_chunks(count, chars, seed):
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for index in range(count):
+        words = []
+        while sum(len(word) + 1 for word in words) < chars:
+            words.append(WORDS[rng.integers(len(WORDS))])
+        chunks.append(f"[{index}] " + " ".join(words) + ".")
+    return chunks
+
+
+def load_chunks(index_path):
+    with open(index_path, "rb") as f:
+        return [entry["text"] for entry in pickle.load(f)["chunk_entries"]]
+
+
+def run(chunks, turns, per_turn, model, num_predict, reuse_session):
+    rng = np.random.default_rng(1)
+    conversation = Conversation("benchmark.pdf")
+    results = []
+
+    for turn in range(turns):
+        picked = [chunks[i] for i in rng.choice(len(chunks), size=min(per_turn, len(chunks)), replace=False)]
+        conversation.ask(f"What does the document say about item {turn + 1}?", picked)
+        if not reuse_session:
+            conversation.session = None
+
+        completion = query_local_llm(conversation, model, num_predict)
+        if completion.failed:
+            raise RuntimeError(completion.text)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            conversation.record(completion)
+        results.append(completion)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to first token for follow-up questions to the local LLM")
+    parser.add_argument("--model", default="mistral")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--chunks-per-turn", type=int, default=5)
+    parser.add_argument("--chunk-chars", type=int, default=800)
+    parser.add_argument("--num-predict", type=int, default=32, help="tokens generated per answer")
+    parser.add_argument("--index", help="use the chunks of a saved document index instead of synthetic text")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.index) if args.index else synthetic_chunks(200, args.chunk_chars, seed=0)
+
+    # The first request also loads the model, which would otherwise be billed to
+    # whichever mode runs first
+    warm_up = Conversation()
+    warm_up.ask("Say OK.", [])
+    query_local_llm(warm_up, args.model, 1)
+
+    session = run(chunks, args.turns, args.chunks_per_turn, args.model, args.num_predict, reuse_session=True)
+    stateless = run(chunks, args.turns, args.chunks_per_turn, args.model, args.num_predict, reuse_session=False)
+
+    print(f"{args.model}, {args.turns} turns, {args.chunks_per_turn} chunks per turn")
+    print(f"{'turn':>4} {'session ttft s':>15} {'evaluated':>10} {'stateless ttft s':>17} {'evaluated':>10}")
+    for turn, (reused, fresh) in enumerate(zip(session, stateless), 1):
+        print(f"{turn:>4} {reused.ttft or 0:15.3f} {reused.prompt_tokens or 0:10d} "
+              f"{fresh.ttft or 0:17.3f} {fresh.prompt_tokens or 0:10d}")
+
+    if args.turns > 1:
+        reused = statistics.mean(completion.ttft or 0 for completion in session[1:])
+        fresh = statistics.mean(completion.ttft or 0 for completion in stateless[1:])
+        print(f"follow-up ttft: {reused:.3f}s with the session, {fresh:.3f}s without "
+              f"({(1 - reused / fresh) * 100 if fresh else 0:.0f}% lower)")
+
+
+if __name__ == "__main__":
+    main()
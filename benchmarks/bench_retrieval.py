@@ -0,0 +1,111 @@
+import argparse
+import contextlib
+import io
+import pickle
+import statistics
+import time
+
+import numpy as np
+
+from app.rag.vector_store import ContentStore
+
+
+def synthetic_entries(count, dim, clusters, seed):
+    # Variance falls off along the dimensions the way it does for embeddings trained
+    # to be truncated, and chunks sit in topical clusters like a real document
+    rng = np.random.default_rng(seed)
+    scale = 1 / np.sqrt(1 + np.arange(dim) / 32)
+    centres = rng.normal(size=(clusters, dim)) * scale
+    vectors = centres[rng.integers(0, clusters, size=count)] + rng.normal(size=(count, dim)) * scale * 0.6
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return [{"chunk_id": str(i), "text": str(i), "embedding": vector.astype("float32")} for i, vector in enumerate(vectors)]
+
+
+def synthetic_queries(entries, count, seed):
+    rng = np.random.default_rng(seed + 1)
+    picked = rng.integers(0, len(entries), size=count)
+    queries = np.array([entries[i]["embedding"] for i in picked])
+    queries = queries + rng.normal(size=queries.shape) * queries.std() * 0.8
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def load_entries(index_path):
+    with open(index_path, "rb") as f:
+        return pickle.load(f)["chunk_entries"]
+
+
+def embed_questions(path):
+    from app.rag.embedder import generate_embeddings
+
+    with open(path) as f:
+        questions = [line.strip() for line in f if line.strip()]
+    return generate_embeddings(questions).cpu().numpy().astype("float32")
+
+
+def recall(found, expected):
+    return len(set(found) & set(expected)) / max(1, len(expected))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare index size, latency and recall of truncated embedding search")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256, 512, 768])
+    parser.add_argument("--chunks", type=int, default=20000, help="number of synthetic chunks")
+    parser.add_argument("--queries", type=int, default=200, help="number of synthetic queries")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rescore-factor", type=int, default=10, help="first-stage candidates per result")
+    parser.add_argument("--index", help="use the chunks of a saved document index instead of synthetic ones")
+    parser.add_argument("--questions", help="text file with one question per line, embedded with the real model")
+    args = parser.parse_args()
+
+    if args.index:
+        entries = load_entries(args.index)
+    else:
+        entries = synthetic_entries(args.chunks, 768, clusters=max(8, args.chunks // 200), seed=0)
+
+    queries = embed_questions(args.questions) if args.questions else synthetic_queries(entries, args.queries, seed=0)
+    full_dim = len(entries[0]["embedding"])
+    top_k = min(args.top_k, len(entries))
+
+    full_matrix = np.array([entry["embedding"] for entry in entries], dtype="float32")
+    full_matrix /= np.linalg.norm(full_matrix, axis=1, keepdims=True)
+    expected = [np.argsort(-(full_matrix @ query), kind="stable")[:top_k].tolist() for query in queries]
+
+    print(f"{len(entries)} chunks, {len(queries)} queries, {full_dim} full dimensions, top {top_k}, "
+          f"{args.rescore_factor}x candidates")
+    print(f"{'dim':>5} {'index MB':>9} {'build ms':>9} {'median ms':>10} {'p95 ms':>8} "
+          f"{'recall':>7} {'coarse recall':>14}")
+
+    for dim in args.dims:
+        with contextlib.redirect_stdout(io.StringIO()):
+            store = ContentStore(entries, search_dim=min(dim, full_dim), rescore_factor=args.rescore_factor)
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), store.index_resource.use() as index:
+            build_seconds = time.perf_counter() - started
+            index_bytes = store.index_bytes(index)
+
+            coarse = []
+            for query in queries:
+                coarse_query = query[:index.d] / np.linalg.norm(query[:index.d])
+                _, I = index.search(np.array([coarse_query]), top_k)
+                coarse.append([i for i in I[0] if i != -1])
+
+            timings = []
+            found = []
+            for query in queries:
+                query_started = time.perf_counter()
+                found.append(store.search(query, top_k))
+                timings.append(time.perf_counter() - query_started)
+
+        timings.sort()
+        print(
+            f"{index.d:>5} {index_bytes / (1024 * 1024):9.1f} {build_seconds * 1000:9.1f} "
+            f"{statistics.median(timings) * 1000:10.3f} {timings[int(len(timings) * 0.95)] * 1000:8.3f} "
+            f"{statistics.mean(map(recall, found, expected)):7.3f} "
+            f"{statistics.mean(map(recall, coarse, expected)):14.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()